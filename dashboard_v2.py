@@ -18,8 +18,11 @@ from PIL import Image, ImageTk
 import threading
 import time
 import json
+import queue
 import urllib.request
 import urllib.parse
+import http.client
+from collections import deque
 from pathlib import Path
 from datetime import datetime
 
@@ -31,13 +34,58 @@ except ImportError:
     FPDF_DISPONIVEL = False
     print("Aviso: fpdf2 nao instalado. Execute: pip install fpdf2")
 
+try:
+    import ffmpegcv
+    FFMPEGCV_DISPONIVEL = True
+except ImportError:
+    FFMPEGCV_DISPONIVEL = False
+
+try:
+    import av
+    AV_DISPONIVEL = True
+except ImportError:
+    AV_DISPONIVEL = False
+
+try:
+    import requests
+    REQUESTS_DISPONIVEL = True
+except ImportError:
+    REQUESTS_DISPONIVEL = False
+
 from src.detector import VehicleDetector
 from src.tracker import VehicleTracker
-from src.color_classifier import ColorClassifier
+from src.color_classifier import ColorClassifier, COLOR_IDS, COLOR_NAMES
 from src.counter import VehicleCounter
 from src.analytics import AdvancedAnalytics
 
 
+# Cores RGB usadas nas tabelas do relatorio PDF
+CORES_RGB = {
+    'vermelho': (231, 76, 60), 'azul': (52, 152, 219),
+    'verde': (39, 174, 96), 'branco': (100, 100, 100),
+    'preto': (52, 73, 94), 'prata': (149, 165, 166),
+    'cinza': (127, 140, 141), 'amarelo': (241, 196, 15),
+    'laranja': (230, 126, 34), 'roxo': (155, 89, 182),
+    'rosa': (253, 121, 168), 'indefinido': (99, 110, 114)
+}
+
+
+# Modelo da mensagem de alerta, montado uma unica vez no import
+_ALERTA_TEMPLATE = """
+<b>ALERTA SIMV - GCM</b>
+
+Veiculo suspeito detectado!
+
+<b>ID:</b> {track_id}
+<b>Cor:</b> {cor}
+<b>Direcao:</b> {direcao}
+<b>Horario:</b> {horario}
+<b>Data:</b> {data}
+
+Equipe de monitoramento acionada.
+        """
+
+
 class TelegramBot:
     """Classe para enviar mensagens via Telegram"""
 
@@ -45,11 +93,34 @@ class TelegramBot:
         self.token = token
         self.chat_id = chat_id
 
+        # Conexao HTTPS persistente: o handshake TLS com a API e pago
+        # uma vez e reutilizado entre alertas, sob lock por seguranca
+        self._conn = None
+        self._conn_lock = threading.Lock()
+
     def configurar(self, token, chat_id):
         """Configura o bot"""
         self.token = token
         self.chat_id = chat_id
 
+    def _post(self, path, corpo, headers):
+        """POST pela conexao persistente, reconectando uma vez se cair"""
+        if self._conn is None:
+            self._conn = http.client.HTTPSConnection('api.telegram.org',
+                                                     timeout=5)
+        try:
+            self._conn.request('POST', path, corpo, headers)
+            resp = self._conn.getresponse()
+        except (http.client.HTTPException, ConnectionError, OSError):
+            # Conexao ociosa fechada pelo servidor: reabrir e repetir
+            self._conn.close()
+            self._conn = http.client.HTTPSConnection('api.telegram.org',
+                                                     timeout=5)
+            self._conn.request('POST', path, corpo, headers)
+            resp = self._conn.getresponse()
+        resp.read()
+        return resp.status
+
     def enviar_mensagem(self, mensagem):
         """Envia mensagem para o Telegram"""
         if not self.token or not self.chat_id:
@@ -57,16 +128,17 @@ class TelegramBot:
             return False
 
         try:
-            url = f"https://api.telegram.org/bot{self.token}/sendMessage"
             dados = {
                 'chat_id': self.chat_id,
                 'text': mensagem,
                 'parse_mode': 'HTML'
             }
-            dados_encoded = urllib.parse.urlencode(dados).encode('utf-8')
-            req = urllib.request.Request(url, data=dados_encoded)
-            urllib.request.urlopen(req, timeout=5)
-            return True
+            corpo = urllib.parse.urlencode(dados).encode('utf-8')
+            headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+            with self._conn_lock:
+                status = self._post(f"/bot{self.token}/sendMessage",
+                                    corpo, headers)
+            return status == 200
         except Exception as e:
             print(f"Erro ao enviar Telegram: {e}")
             return False
@@ -94,12 +166,35 @@ class SIMVDashboardV2:
         self.style = ttk.Style()
         self.root.configure(bg=self.bg_color)
 
+        # Estilos nomeados registrados uma unica vez: os widgets
+        # referenciam o nome e o Tk resolve fonte/cor por estilo, nao
+        # por widget construido
+        self.style.configure('StatTitle.TLabel',
+                             font=('Segoe UI', 10, 'bold'),
+                             foreground='#888888')
+        self.style.configure('StatEntrada.TLabel',
+                             font=('Segoe UI', 36, 'bold'),
+                             foreground='#27ae60')
+        self.style.configure('StatSaida.TLabel',
+                             font=('Segoe UI', 36, 'bold'),
+                             foreground='#e74c3c')
+        self.style.configure('StatTotal.TLabel',
+                             font=('Segoe UI', 36, 'bold'),
+                             foreground='#3498db')
+        self.style.configure('Control.TLabel', font=('Segoe UI', 9))
+        self.style.configure('ControlValue.TLabel',
+                             font=('Segoe UI', 9, 'bold'))
+
         # Variaveis de controle
         self.is_running = False
         self.is_paused = False
         self.video_path = None
         self.cap = None
 
+        # Ultimo segundo formatado no relogio (evita reformatar sem
+        # mudanca quando o mainloop dispara o callback adiantado)
+        self._last_clock_s = -1
+
         # Modulos de processamento
         self.detector = None
         self.tracker = None
@@ -119,22 +214,108 @@ class SIMVDashboardV2:
         # Zoom do video
         self.zoom_level = 1.0
 
+        # Cache do zoom: limites do crop e buffer de saida preallocado,
+        # invalidados quando (altura, largura, zoom) muda
+        self._zoom_key = None
+        self._zoom_bounds = None
+        self._zoom_out = None
+
+        # FPS alvo da analise (frames da fonte alem disso sao pulados)
+        self.target_fps = 10
+
+        # Meia-altura relativa da faixa de deteccao em torno da linha
+        self.detection_band = 0.18
+
+        # Rodar o detector a cada K frames amostrados; nos demais o
+        # tracker apenas extrapola as caixas pela velocidade recente
+        self.detect_stride = 3
+
+        # Tamanho do mini-batch de inferencia
+        self.batch_size = 4
+
         # Sistema de Alerta
         self.cor_alerta = None
         self.alerta_ativo = False
         self.alerta_flash = False
-        self.ultimo_alerta_enviado = 0  # Timestamp para evitar spam
+
+        # Timestamp do ultimo alerta por cor (indexado pelo id compacto
+        # da cor): a elegibilidade e uma comparacao vetorizada, pronta
+        # para monitorar varias cores sem branch por deteccao
+        self._alerta_cooldown = np.zeros(len(COLOR_NAMES), dtype=np.int64)
 
         # Telegram Bot
         self.telegram = TelegramBot()
+        self._tg_win = None  # Toplevel de configuracao, criada sob demanda
+
+        # Fila de envio do Telegram drenada por um unico worker; com
+        # requests instalado a sessao persistente reaproveita a conexao
+        # TLS entre alertas em vez de pagar handshake a cada envio
+        self._tg_queue = queue.Queue()
+        self._tg_session = requests.Session() if REQUESTS_DISPONIVEL else None
+        threading.Thread(target=self._tg_worker, daemon=True).start()
 
         # Controle de fluxo de trafego
         self.tempo_inicio_processamento = None
-        self.contagem_ultimo_minuto = []  # Lista de timestamps de contagem
+        # Timestamps de contagem da janela de 60 s: deque permite
+        # descartar os antigos com popleft O(1) a cada atualizacao
+        self.contagem_ultimo_minuto = deque()
+
+        # Caminho OpenCL para o preparo de exibicao (cvtColor/resize em
+        # UMat quando a plataforma oferece OpenCL)
+        self._use_ocl = bool(cv2.ocl.haveOpenCL())
+        self.gpu_display_var = ttk.BooleanVar(value=self._use_ocl)
+
+        # Placeholder do video renderizado uma unica vez
+        self._placeholder_frame = self._build_placeholder()
+
+        # Slot unico "frame mais recente" para exibicao: a thread de
+        # analise sobrescreve sem backpressure e o loop do Tk
+        # (_pump_display) le-e-limpa; se a UI atrasa, frames velhos sao
+        # simplesmente substituidos e a latencia nao acumula
+        self._latest_frame = None
+        self._latest_lock = threading.Lock()
+
+        # Estagio de render em thread propria, com o mesmo padrao de
+        # slot unico drop-old: a analise entrega (frame, tracks) e segue
+        # para o proximo frame sem pagar putText/blend; se o render
+        # atrasa, frames intermediarios sao descartados sem represar a
+        # deteccao
+        self._render_slot = None
+        self._render_lock = threading.Lock()
+        self._render_event = threading.Event()
+        threading.Thread(target=self._render_worker, daemon=True).start()
+
+        # Ultimo snapshot de estatisticas exibido (evita reconfigurar
+        # os labels quando a contagem nao mudou)
+        self._last_stats = None
+
+        # Buffers ping-pong ja no tamanho de exibicao: a thread de
+        # analise redimensiona direto neles (dst=) e alterna o indice,
+        # sem alocar nem copiar um frame inteiro por publicacao
+        self._ui_buffers = None
+        self._ui_write_idx = 0
+
+        # Frame vermelho constante do flash de alerta, criado sob demanda
+        self._red_overlay = None
+
+        # PhotoImage reutilizada via paste(): alocar um objeto de imagem
+        # Tk por frame e churn desnecessario na taxa de exibicao
+        self._photo = None
+
+        # Buffer de log: eventos acumulam aqui (append barato, qualquer
+        # thread) e um flush periodico faz as insercoes no Treeview
+        self._log_buffer = deque(maxlen=200)
+        self._log_iids = deque(maxlen=200)
 
         # Construir interface
         self._build_ui()
 
+        # Bomba de exibicao (~60 Hz, descartando frames atrasados)
+        self._pump_display()
+
+        # Flush periodico do log (2 Hz)
+        self._flush_log()
+
     def _build_ui(self):
         """Constroi a interface do usuario"""
         # Container principal
@@ -249,8 +430,9 @@ class SIMVDashboardV2:
             width=10
         ).pack(side=LEFT, padx=5)
 
-    def _show_placeholder(self):
-        """Mostra placeholder quando nao ha video"""
+    @staticmethod
+    def _build_placeholder():
+        """Renderiza o frame de placeholder (feito uma vez no __init__)"""
         placeholder = np.zeros((720, 1280, 3), dtype=np.uint8)
         placeholder[:] = (30, 30, 45)
 
@@ -260,35 +442,29 @@ class SIMVDashboardV2:
         cv2.putText(placeholder, "Selecione um video para iniciar",
                     (450, 400), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (60, 60, 80), 1)
 
-        self._display_frame(placeholder)
+        return placeholder
+
+    def _show_placeholder(self):
+        """Mostra placeholder quando nao ha video"""
+        self._display_frame(self._placeholder_frame)
 
     def _build_stats_panel(self, parent):
         """Painel de estatisticas - ENTRADA, SAIDA, TOTAL"""
         stats_frame = ttk.Frame(parent)
         stats_frame.pack(fill=X, pady=(0, 10))
 
-        # Grid horizontal
-        for i, (key, label, color) in enumerate([
-            ("entrada", "ENTRADA", "#27ae60"),
-            ("saida", "SAIDA", "#e74c3c"),
-            ("total", "TOTAL", "#3498db")
-        ]):
+        # Grid horizontal (estilos nomeados, resolvidos uma vez)
+        for key, label, style_name in [
+            ("entrada", "ENTRADA", "StatEntrada.TLabel"),
+            ("saida", "SAIDA", "StatSaida.TLabel"),
+            ("total", "TOTAL", "StatTotal.TLabel")
+        ]:
             frame = ttk.Frame(stats_frame)
             frame.pack(side=LEFT, expand=YES, fill=X, padx=5)
 
-            ttk.Label(
-                frame,
-                text=label,
-                font=("Segoe UI", 10, "bold"),
-                foreground="#888888"
-            ).pack()
-
-            lbl = ttk.Label(
-                frame,
-                text="0",
-                font=("Segoe UI", 36, "bold"),
-                foreground=color
-            )
+            ttk.Label(frame, text=label, style='StatTitle.TLabel').pack()
+
+            lbl = ttk.Label(frame, text="0", style=style_name)
             lbl.pack()
             setattr(self, f"stat_{key}", lbl)
 
@@ -334,7 +510,7 @@ class SIMVDashboardV2:
         line_frame = ttk.Frame(control_frame)
         line_frame.pack(fill=X)
 
-        ttk.Label(line_frame, text="Linha:", font=("Segoe UI", 9)).pack(side=LEFT)
+        ttk.Label(line_frame, text="Linha:", style='Control.TLabel').pack(side=LEFT)
 
         self.line_var = ttk.DoubleVar(value=0.5)
         ttk.Scale(
@@ -347,14 +523,34 @@ class SIMVDashboardV2:
             length=120
         ).pack(side=LEFT, padx=5)
 
-        self.line_label = ttk.Label(line_frame, text="50%", font=("Segoe UI", 9, "bold"))
+        self.line_label = ttk.Label(line_frame, text="50%", style='ControlValue.TLabel')
         self.line_label.pack(side=LEFT)
 
+        # Faixa de deteccao em torno da linha
+        band_frame = ttk.Frame(control_frame)
+        band_frame.pack(fill=X, pady=(5, 0))
+
+        ttk.Label(band_frame, text="Faixa:", style='Control.TLabel').pack(side=LEFT)
+
+        self.band_var = ttk.DoubleVar(value=0.18)
+        ttk.Scale(
+            band_frame,
+            from_=0.05,
+            to=0.5,
+            variable=self.band_var,
+            bootstyle="secondary",
+            command=self._on_band_change,
+            length=120
+        ).pack(side=LEFT, padx=5)
+
+        self.band_label = ttk.Label(band_frame, text="18%", style='ControlValue.TLabel')
+        self.band_label.pack(side=LEFT)
+
         # Zoom do video
         zoom_frame = ttk.Frame(control_frame)
         zoom_frame.pack(fill=X, pady=(5, 0))
 
-        ttk.Label(zoom_frame, text="Zoom:", font=("Segoe UI", 9)).pack(side=LEFT)
+        ttk.Label(zoom_frame, text="Zoom:", style='Control.TLabel').pack(side=LEFT)
 
         self.zoom_var = ttk.DoubleVar(value=1.0)
         ttk.Scale(
@@ -367,9 +563,68 @@ class SIMVDashboardV2:
             length=120
         ).pack(side=LEFT, padx=5)
 
-        self.zoom_label = ttk.Label(zoom_frame, text="1.0x", font=("Segoe UI", 9, "bold"))
+        self.zoom_label = ttk.Label(zoom_frame, text="1.0x", style='ControlValue.TLabel')
         self.zoom_label.pack(side=LEFT)
 
+        # FPS alvo da analise
+        fps_frame = ttk.Frame(control_frame)
+        fps_frame.pack(fill=X, pady=(5, 0))
+
+        ttk.Label(fps_frame, text="FPS:", style='Control.TLabel').pack(side=LEFT)
+
+        self.target_fps_var = ttk.IntVar(value=10)
+        ttk.Scale(
+            fps_frame,
+            from_=1,
+            to=30,
+            variable=self.target_fps_var,
+            bootstyle="success",
+            command=self._on_target_fps_change,
+            length=120
+        ).pack(side=LEFT, padx=5)
+
+        self.fps_label = ttk.Label(fps_frame, text="10", style='ControlValue.TLabel')
+        self.fps_label.pack(side=LEFT)
+
+        # Tamanho do lote de inferencia
+        batch_frame = ttk.Frame(control_frame)
+        batch_frame.pack(fill=X, pady=(5, 0))
+
+        ttk.Label(batch_frame, text="Batch:", style='Control.TLabel').pack(side=LEFT)
+
+        self.batch_var = ttk.IntVar(value=4)
+        ttk.Scale(
+            batch_frame,
+            from_=1,
+            to=8,
+            variable=self.batch_var,
+            bootstyle="info",
+            command=self._on_batch_change,
+            length=120
+        ).pack(side=LEFT, padx=5)
+
+        self.batch_label = ttk.Label(batch_frame, text="4", style='ControlValue.TLabel')
+        self.batch_label.pack(side=LEFT)
+
+        # Decodificacao por hardware (NVDEC via ffmpegcv)
+        self.gpu_decode_var = ttk.BooleanVar(value=FFMPEGCV_DISPONIVEL)
+        ttk.Checkbutton(
+            control_frame,
+            text="GPU Decode (NVDEC)",
+            variable=self.gpu_decode_var,
+            bootstyle="round-toggle",
+            state=NORMAL if FFMPEGCV_DISPONIVEL else DISABLED
+        ).pack(anchor=W, pady=(8, 0))
+
+        # Preparo de exibicao via OpenCL (UMat)
+        ttk.Checkbutton(
+            control_frame,
+            text="GPU Display (OpenCL)",
+            variable=self.gpu_display_var,
+            bootstyle="round-toggle",
+            state=NORMAL if self._use_ocl else DISABLED
+        ).pack(anchor=W, pady=(4, 0))
+
     def _build_alert_panel(self, parent):
         """Painel de configuracao de alerta"""
         alert_frame = ttk.Labelframe(parent, text=" Sistema de Alerta ", padding=10)
@@ -415,7 +670,24 @@ class SIMVDashboardV2:
             self._add_log(f"Alerta ativado: {cor.upper()}")
 
     def _abrir_config_telegram(self):
-        """Abre janela de configuracao do Telegram"""
+        """Abre janela de configuracao do Telegram.
+
+        A Toplevel e construida uma unica vez e depois apenas
+        reexibida (deiconify), evitando recriar toda a arvore de
+        widgets a cada clique no botao de configuracao.
+        """
+        if self._tg_win is not None:
+            # Reexibir com os valores atuais do bot
+            self.token_entry.delete(0, tk.END)
+            if self.telegram.token:
+                self.token_entry.insert(0, self.telegram.token)
+            self.chatid_entry.delete(0, tk.END)
+            if self.telegram.chat_id:
+                self.chatid_entry.insert(0, self.telegram.chat_id)
+            self._tg_win.deiconify()
+            self._tg_win.lift()
+            return
+
         config_win = ttk.Toplevel(self.root)
         config_win.title("Configurar Telegram")
         config_win.geometry("550x450")
@@ -484,10 +756,14 @@ class SIMVDashboardV2:
             btn_frame,
             text="Cancelar",
             bootstyle="secondary",
-            command=config_win.destroy,
+            command=config_win.withdraw,
             width=15
         ).pack(side=RIGHT, ipady=5)
 
+        # Fechar apenas esconde: a janela e reaproveitada na proxima vez
+        config_win.protocol("WM_DELETE_WINDOW", config_win.withdraw)
+        self._tg_win = config_win
+
     def _testar_telegram(self, win):
         """Testa envio de mensagem"""
         token = self.token_entry.get().strip()
@@ -512,7 +788,7 @@ class SIMVDashboardV2:
 
         self.telegram.configurar(token, chat_id)
         self._add_log("Telegram configurado!")
-        win.destroy()
+        win.withdraw()
 
     def _exportar_pdf(self):
         """Exporta relatorio em PDF"""
@@ -663,25 +939,24 @@ class SIMVDashboardV2:
 
             pdf.set_font('Helvetica', '', 11)
 
-            # Ordenar por quantidade
+            # Ordenar por quantidade e materializar as linhas antes de
+            # entrar no loop do fpdf
             sorted_colors = sorted(color_dist.items(), key=lambda x: x[1], reverse=True)
             total_cores = sum(color_dist.values()) or 1
 
-            cores_rgb = {
-                'vermelho': (231, 76, 60), 'azul': (52, 152, 219),
-                'verde': (39, 174, 96), 'branco': (100, 100, 100),
-                'preto': (52, 73, 94), 'prata': (149, 165, 166),
-                'cinza': (127, 140, 141), 'amarelo': (241, 196, 15),
-                'laranja': (230, 126, 34), 'roxo': (155, 89, 182),
-                'rosa': (253, 121, 168), 'indefinido': (99, 110, 114)
-            }
+            rows = [(cor.upper(), str(qtd), f"{(qtd/total_cores)*100:.1f}%",
+                     CORES_RGB.get(cor, (0, 0, 0)))
+                    for cor, qtd in sorted_colors]
 
-            for cor, qtd in sorted_colors:
-                rgb = cores_rgb.get(cor, (0, 0, 0))
-                pdf.set_text_color(*rgb)
-                pdf.cell(90, 8, cor.upper(), 1, 0, 'C')
-                pdf.cell(45, 8, str(qtd), 1, 0, 'C')
-                pdf.cell(45, 8, f"{(qtd/total_cores)*100:.1f}%", 1, 1, 'C')
+            rgb_atual = None
+            for label, qtd_s, pct_s, rgb in rows:
+                # Trocar a cor do texto so quando ela realmente muda
+                if rgb != rgb_atual:
+                    pdf.set_text_color(*rgb)
+                    rgb_atual = rgb
+                pdf.cell(90, 8, label, 1, 0, 'C')
+                pdf.cell(45, 8, qtd_s, 1, 0, 'C')
+                pdf.cell(45, 8, pct_s, 1, 1, 'C')
 
         pdf.ln(10)
 
@@ -713,44 +988,62 @@ class SIMVDashboardV2:
         pdf.cell(0, 5, 'Projeto IBM Smart Cities - Prefeitura Municipal', 0, 1, 'C')
         pdf.cell(0, 5, f'Relatorio gerado em {datetime.now().strftime("%d/%m/%Y as %H:%M:%S")}', 0, 1, 'C')
 
-        # Salvar PDF
-        pdf.output(filepath)
+        # Serializar em memoria e gravar os bytes com um unico write
+        with open(filepath, 'wb') as f:
+            f.write(bytes(pdf.output()))
 
     def _disparar_alerta(self, track_id, cor, direcao):
         """Dispara alerta visual e envia Telegram"""
-        agora = time.time()
+        agora = int(time.time())
 
-        # Evitar spam (minimo 10 segundos entre alertas)
-        if agora - self.ultimo_alerta_enviado < 10:
+        # Evitar spam: cooldown de 10 s por cor monitorada
+        idx = COLOR_IDS.get(cor, len(COLOR_NAMES) - 1)
+        if agora - self._alerta_cooldown[idx] < 10:
             return
 
-        self.ultimo_alerta_enviado = agora
+        self._alerta_cooldown[idx] = agora
         self.alerta_ativo = True
 
         # Log
         self._add_log(f"ALERTA! ID{track_id} {cor.upper()} - {direcao}")
 
-        # Enviar Telegram
-        mensagem = f"""
-<b>ALERTA SIMV - GCM</b>
-
-Veiculo suspeito detectado!
-
-<b>ID:</b> {track_id}
-<b>Cor:</b> {cor.upper()}
-<b>Direcao:</b> {direcao.upper()}
-<b>Horario:</b> {datetime.now().strftime('%H:%M:%S')}
-<b>Data:</b> {datetime.now().strftime('%d/%m/%Y')}
-
-Equipe de monitoramento acionada.
-        """
+        # Enviar Telegram (um unico datetime.now() preenche o modelo)
+        agora_dt = datetime.now()
+        mensagem = _ALERTA_TEMPLATE.format(
+            track_id=track_id,
+            cor=cor.upper(),
+            direcao=direcao.upper(),
+            horario=agora_dt.strftime('%H:%M:%S'),
+            data=agora_dt.strftime('%d/%m/%Y')
+        )
 
-        # Enviar em thread separada para nao travar
-        threading.Thread(target=self.telegram.enviar_mensagem, args=(mensagem,), daemon=True).start()
+        # Enfileirar para o worker de envio (nao trava nem acumula threads)
+        self._tg_queue.put(mensagem)
 
         # Piscar tela por 3 segundos
         self._iniciar_flash_alerta()
 
+    def _tg_worker(self):
+        """Drena a fila de alertas do Telegram em uma unica thread"""
+        while True:
+            mensagem = self._tg_queue.get()
+            if not self.telegram.token or not self.telegram.chat_id:
+                continue
+
+            if self._tg_session is not None:
+                try:
+                    url = f"https://api.telegram.org/bot{self.telegram.token}/sendMessage"
+                    self._tg_session.post(url, data={
+                        'chat_id': self.telegram.chat_id,
+                        'text': mensagem,
+                        'parse_mode': 'HTML'
+                    }, timeout=5)
+                except Exception as e:
+                    print(f"Erro ao enviar Telegram: {e}")
+            else:
+                # Sem requests: envio avulso via urllib do TelegramBot
+                self.telegram.enviar_mensagem(mensagem)
+
     def _iniciar_flash_alerta(self):
         """Inicia efeito de piscar"""
         self.alerta_flash = True
@@ -851,9 +1144,12 @@ Equipe de monitoramento acionada.
         scrollbar.pack(side=RIGHT, fill=Y)
 
     def _update_clock(self):
-        """Atualiza o relogio"""
-        now = datetime.now().strftime("%d/%m/%Y  %H:%M:%S")
-        self.clock_label.config(text=now)
+        """Atualiza o relogio (formata so quando o segundo vira)"""
+        now_int = int(time.time())
+        if now_int != self._last_clock_s:
+            self._last_clock_s = now_int
+            self.clock_label.config(
+                text=datetime.now().strftime("%d/%m/%Y  %H:%M:%S"))
         self.root.after(1000, self._update_clock)
 
     def _on_line_change(self, value):
@@ -864,32 +1160,52 @@ Equipe de monitoramento acionada.
         if self.counter:
             self.counter.line_y = int(self.counter.frame_height * self.line_position)
 
+    def _on_band_change(self, value):
+        """Callback para mudanca da faixa de deteccao"""
+        self.detection_band = float(value)
+        self.band_label.config(text=f"{int(self.detection_band * 100)}%")
+
     def _on_zoom_change(self, value):
         """Callback para mudanca do zoom"""
         self.zoom_level = float(value)
         self.zoom_label.config(text=f"{self.zoom_level:.1f}x")
 
-    def _apply_zoom(self, frame, zoom_level):
-        """Aplica zoom no frame (crop central e redimensiona)"""
-        h, w = frame.shape[:2]
-
-        # Calcular tamanho da regiao de crop
-        crop_w = int(w / zoom_level)
-        crop_h = int(h / zoom_level)
+    def _on_target_fps_change(self, value):
+        """Callback para mudanca do FPS de analise"""
+        self.target_fps = max(1, int(float(value)))
+        self.fps_label.config(text=str(self.target_fps))
 
-        # Calcular coordenadas do centro
-        x1 = (w - crop_w) // 2
-        y1 = (h - crop_h) // 2
-        x2 = x1 + crop_w
-        y2 = y1 + crop_h
+    def _on_batch_change(self, value):
+        """Callback para mudanca do tamanho do lote"""
+        self.batch_size = max(1, int(float(value)))
+        self.batch_label.config(text=str(self.batch_size))
 
-        # Crop da regiao central
-        cropped = frame[y1:y2, x1:x2]
+    def _apply_zoom(self, frame, zoom_level):
+        """Aplica zoom no frame (crop central e redimensiona).
 
-        # Redimensionar de volta ao tamanho original
-        zoomed = cv2.resize(cropped, (w, h), interpolation=cv2.INTER_LINEAR)
+        Limites do crop e buffer de saida sao cacheados por (altura,
+        largura, zoom): enquanto o slider nao muda, cada frame custa so
+        o resize para o buffer preallocado, sem aritmetica nem malloc.
+        """
+        # Sem zoom o frame passa direto
+        if zoom_level <= 1.0:
+            return frame
 
-        return zoomed
+        h, w = frame.shape[:2]
+        key = (h, w, zoom_level)
+        if self._zoom_key != key:
+            crop_w = int(w / zoom_level)
+            crop_h = int(h / zoom_level)
+            x1 = (w - crop_w) // 2
+            y1 = (h - crop_h) // 2
+            self._zoom_bounds = (x1, y1, x1 + crop_w, y1 + crop_h)
+            self._zoom_out = np.empty((h, w, 3), dtype=np.uint8)
+            self._zoom_key = key
+
+        x1, y1, x2, y2 = self._zoom_bounds
+        cv2.resize(frame[y1:y2, x1:x2], (w, h), dst=self._zoom_out,
+                   interpolation=cv2.INTER_LINEAR)
+        return self._zoom_out
 
     def _select_video(self):
         """Seleciona video"""
@@ -945,16 +1261,123 @@ Equipe de monitoramento acionada.
 
         self._add_log("Processamento finalizado")
 
+    def _open_capture(self):
+        """Abre o video, preferindo decodificacao NVDEC via ffmpegcv.
+
+        Com a checkbox "GPU Decode" ativa e ffmpegcv instalado, a
+        decodificacao H.264/H.265 sai da CPU e vai para o NVDEC; o
+        pix_fmt bgr24 mantem detector, classificador e desenho
+        inalterados. Qualquer falha cai de volta no cv2.VideoCapture
+        com backend FFMPEG e buffer de 1 frame (fontes ao vivo nao
+        acumulam frames velhos entre leituras).
+        """
+        if FFMPEGCV_DISPONIVEL and self.gpu_decode_var.get():
+            try:
+                return ffmpegcv.VideoCaptureNV(self.video_path, pix_fmt='bgr24')
+            except Exception as e:
+                self._add_log(f"GPU decode indisponivel: {e}")
+        cap = cv2.VideoCapture(self.video_path, cv2.CAP_FFMPEG)
+        if not cap.isOpened():
+            # Nem toda fonte (ex.: indice de webcam) abre via FFMPEG
+            cap = cv2.VideoCapture(self.video_path)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    def _read_sampled(self, stride):
+        """Le o proximo frame amostrado do video.
+
+        Os frames descartados passam apenas por grab() (decodifica sem
+        reconstruir a imagem); retrieve() roda so no frame que segue
+        para o pipeline, o que barateia muito a ingestao de fontes a
+        30 FPS analisadas a poucos FPS.
+        """
+        if not hasattr(self.cap, 'grab'):
+            # Leitores sem grab/retrieve (ex.: ffmpegcv): descartar via read()
+            ret, frame = False, None
+            for _ in range(stride):
+                ret, frame = self.cap.read()
+                if not ret:
+                    return False, None
+            return ret, frame
+
+        for _ in range(stride - 1):
+            if not self.cap.grab():
+                return False, None
+        if not self.cap.grab():
+            return False, None
+        return self.cap.retrieve()
+
+    def _decode_producer(self, container, stride):
+        """Demuxa e decodifica o video em lote, alimentando a fila de frames.
+
+        Rodar o PyAV continuamente em uma thread produtora amortiza o
+        overhead por frame e desacopla a decodificacao da analise; so
+        os frames amostrados pagam a conversao para ndarray bgr24. A
+        fila limitada (maxsize=8) segura o produtor quando a analise
+        nao acompanha.
+        """
+        try:
+            video_stream = container.streams.video[0]
+            idx = 0
+            for packet in container.demux(video_stream):
+                for frame in packet.decode():
+                    if not self.is_running:
+                        return
+                    while self.is_paused and self.is_running:
+                        time.sleep(0.1)
+                    idx += 1
+                    if idx % stride:
+                        continue
+                    # put com timeout em loop: no Stop o consumidor para
+                    # de drenar, e um put bloqueante prenderia a thread
+                    # (e o container) para sempre
+                    arr = frame.to_ndarray(format='bgr24')
+                    while self.is_running:
+                        try:
+                            self._frame_q.put(arr, timeout=0.1)
+                            break
+                        except queue.Full:
+                            continue
+                    if not self.is_running:
+                        return
+        finally:
+            # Sentinela de fim de video (desiste se ninguem drena mais)
+            while True:
+                try:
+                    self._frame_q.put(None, timeout=0.1)
+                    break
+                except queue.Full:
+                    if not self.is_running:
+                        break
+            container.close()
+
     def _process_video(self):
         """Processa o video"""
         try:
-            self.cap = cv2.VideoCapture(self.video_path)
-            if not self.cap.isOpened():
-                raise ValueError("Erro ao abrir video")
-
-            width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            fps = int(self.cap.get(cv2.CAP_PROP_FPS)) or 30
+            # Fonte de frames: NVDEC quando habilitado, senao PyAV em
+            # lote, senao cv2.VideoCapture
+            use_av = AV_DISPONIVEL and not (FFMPEGCV_DISPONIVEL and self.gpu_decode_var.get())
+
+            if use_av:
+                container = av.open(self.video_path)
+                video_stream = container.streams.video[0]
+                width = int(video_stream.codec_context.width)
+                height = int(video_stream.codec_context.height)
+                fps = int(video_stream.average_rate or 30)
+            else:
+                self.cap = self._open_capture()
+                if not self.cap.isOpened():
+                    raise ValueError("Erro ao abrir video")
+
+                if isinstance(self.cap, cv2.VideoCapture):
+                    width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+                    height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                    fps = int(self.cap.get(cv2.CAP_PROP_FPS)) or 30
+                else:
+                    # ffmpegcv expoe dimensoes/fps como atributos
+                    width = int(self.cap.width)
+                    height = int(self.cap.height)
+                    fps = int(self.cap.fps) or 30
 
             self.detector = VehicleDetector(model_size='n', confidence=0.5)
             self.tracker = VehicleTracker()
@@ -964,68 +1387,201 @@ Equipe de monitoramento acionada.
 
             self.vehicle_colors = {}
             frame_count = 0
+            sample_idx = 0
             start_time = time.time()
             self.tempo_inicio_processamento = start_time
-            self.contagem_ultimo_minuto = []
+            self.contagem_ultimo_minuto = deque()
+
+            # Analisar no maximo target_fps frames por segundo da fonte
+            stride = max(1, int(round(fps / max(1, self.target_fps))))
+            frame_period = stride / fps
+
+            if use_av:
+                self._frame_q = queue.Queue(maxsize=8)
+                threading.Thread(target=self._decode_producer,
+                                 args=(container, stride), daemon=True).start()
+
+            # Mini-batch de frames para amortizar o custo por inferencia;
+            # o detector ve apenas a faixa em torno da linha de contagem
+            batch_frames = []
+            batch_rois = []
+            batch_offsets = []
+            batch_stamps = []
+            batch_detect = []
+
+            def flush_batch(pace):
+                """Roda a inferencia do lote e os estagios por frame"""
+                # So os frames marcados pagam inferencia; os demais
+                # avancam por extrapolacao do tracker (detections=None)
+                rois = [r for r, d in zip(batch_rois, batch_detect) if d]
+                det_iter = iter(self.detector.detect_batch(rois) if rois
+                                else [])
+                for bframe, bstamp, y_off, detectar in zip(
+                        batch_frames, batch_stamps, batch_offsets, batch_detect):
+                    if detectar:
+                        detections = next(det_iter)
+                        # Recolocar as bboxes nas coordenadas do frame
+                        # cheio (soma vetorizada nas colunas y do batch)
+                        if y_off:
+                            detections.xyxy[:, 1] += y_off
+                            detections.xyxy[:, 3] += y_off
+                    else:
+                        detections = None
+                    self._analyze_frame(bframe, detections, bstamp)
+                    if pace:
+                        time.sleep(frame_period)
+                batch_frames.clear()
+                batch_rois.clear()
+                batch_offsets.clear()
+                batch_stamps.clear()
+                batch_detect.clear()
 
             while self.is_running:
                 if self.is_paused:
                     time.sleep(0.1)
                     continue
 
-                ret, frame = self.cap.read()
-                if not ret:
-                    break
+                if use_av:
+                    frame = self._frame_q.get()
+                    if frame is None:
+                        break
+                else:
+                    ret, frame = self._read_sampled(stride)
+                    if not ret:
+                        break
 
-                frame_count += 1
+                frame_count += stride
                 timestamp = frame_count / fps
 
-                # Aplicar zoom (crop central)
+                # Aplicar zoom (crop central); copiar porque o buffer de
+                # zoom e reutilizado e o lote guarda varios frames
                 if self.zoom_level > 1.0:
-                    frame = self._apply_zoom(frame, self.zoom_level)
+                    frame = self._apply_zoom(frame, self.zoom_level).copy()
+
+                # Cruzamentos so acontecem perto da linha: o detector
+                # recebe apenas essa faixa (fracao dos pixels do frame)
+                band = int(height * self.detection_band)
+                line_y = int(height * self.line_position)
+                y0 = max(0, line_y - band)
+                y1 = min(height, line_y + band)
+
+                batch_frames.append(frame)
+                batch_rois.append(frame[y0:y1])
+                batch_offsets.append(y0)
+                batch_stamps.append(timestamp)
+                batch_detect.append(
+                    sample_idx % max(1, self.detect_stride) == 0)
+                sample_idx += 1
+
+                if len(batch_frames) < max(1, self.batch_size):
+                    continue
 
-                # Deteccao e tracking
-                detections = self.detector.detect(frame)
-                tracked_vehicles = self.tracker.update(detections, frame)
+                # Uma unica inferencia cobre o lote inteiro
+                flush_batch(pace=True)
 
-                # Classificacao de cores
-                for vehicle in tracked_vehicles:
-                    track_id = vehicle.get('track_id', -1)
-                    if track_id >= 0:
-                        color = self.color_classifier.classify_with_smoothing(
-                            track_id, frame, vehicle['bbox']
-                        )
-                        self.vehicle_colors[track_id] = color
+            # Processar o resto do lote no fim do video
+            if batch_frames and self.is_running:
+                flush_batch(pace=False)
 
-                # Contagem
-                newly_counted = self.counter.update(tracked_vehicles, self.vehicle_colors, timestamp)
+            self._stop_processing()
 
-                # Log de eventos e verificar alertas
-                for track_id, direction in newly_counted:
-                    color = self.vehicle_colors.get(track_id, 'indefinido')
-                    dir_text = "entrada" if direction == "entrada" else "saida"
-                    self._add_log(f"ID{track_id} ({color}) - {dir_text}")
+        except Exception as e:
+            self.root.after(0, lambda: messagebox.showerror("Erro", str(e)))
+            self._stop_processing()
 
-                    # Registrar timestamp da contagem para calculo de fluxo
-                    self.contagem_ultimo_minuto.append(time.time())
+    def _analyze_frame(self, frame, detections, timestamp):
+        """Estagio por frame do pipeline: tracking, cores, contagem e UI.
 
-                    # Verificar se cor corresponde ao alerta
-                    if self.cor_alerta and color.lower() == self.cor_alerta.lower():
-                        self.root.after(0, lambda tid=track_id, c=color, d=dir_text: self._disparar_alerta(tid, c, d))
+        detections=None marca um frame sem inferencia: o tracker
+        extrapola as caixas e a classificacao de cor reaproveita o
+        valor suavizado ja conhecido de cada track.
+        """
+        tracked_vehicles = self.tracker.update(detections, frame)
+
+        # Classificacao de cores (apenas em frames com deteccao real):
+        # uma conversao HSV do frame cobre todos os veiculos de uma vez
+        if detections is not None:
+            vehicles = [v for v in tracked_vehicles
+                        if v.get('track_id', -1) >= 0]
+            if vehicles:
+                hsv_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+                track_ids = [v['track_id'] for v in vehicles]
+                cores = self.color_classifier.classify_many(
+                    hsv_frame, [v['bbox'] for v in vehicles], track_ids
+                )
+                for track_id, color in zip(track_ids, cores):
+                    self.vehicle_colors[track_id] = color
+
+        # Contagem
+        newly_counted = self.counter.update(tracked_vehicles, self.vehicle_colors, timestamp)
+
+        # Log de eventos e verificar alertas
+        for track_id, direction in newly_counted:
+            color = self.vehicle_colors.get(track_id, 'indefinido')
+            dir_text = "entrada" if direction == "entrada" else "saida"
+            self._add_log(f"ID{track_id} ({color}) - {dir_text}")
 
-                # Desenhar visualizacoes
-                frame = self._draw_frame(frame, tracked_vehicles)
+            # Registrar timestamp da contagem para calculo de fluxo
+            self.contagem_ultimo_minuto.append(time.time())
 
-                # Atualizar UI
-                self.root.after(0, lambda f=frame.copy(): self._update_ui(f))
+            # Verificar se cor corresponde ao alerta
+            if self.cor_alerta and color.lower() == self.cor_alerta.lower():
+                self.root.after(0, lambda tid=track_id, c=color, d=dir_text: self._disparar_alerta(tid, c, d))
 
-                time.sleep(1 / fps)
+        # Entregar desenho e publicacao a thread de render
+        with self._render_lock:
+            self._render_slot = (frame, tracked_vehicles)
+        self._render_event.set()
 
-            self._stop_processing()
+    def _render_worker(self):
+        """Thread de render: desenha e publica fora da thread de analise.
 
-        except Exception as e:
-            self.root.after(0, lambda: messagebox.showerror("Erro", str(e)))
-            self._stop_processing()
+        Consome o slot unico alimentado por _analyze_frame. O desenho
+        (linha, bboxes, painel, flash) nao afeta a contagem, entao pode
+        rodar atrasado ou pular frames sem custo de corretude.
+        """
+        while True:
+            self._render_event.wait()
+            self._render_event.clear()
+
+            with self._render_lock:
+                item = self._render_slot
+                self._render_slot = None
+
+            if item is None:
+                continue
+
+            frame, tracked_vehicles = item
+            frame = self._draw_frame(frame, tracked_vehicles)
+
+            # Publicar para a UI sobrescrevendo o slot (drop-old); o
+            # resize para o tamanho de exibicao acontece aqui, em
+            # buffer reutilizado
+            self._publish_frame(frame)
+
+    def _publish_frame(self, frame):
+        """Redimensiona o frame para exibicao e publica no slot da UI.
+
+        Os dois buffers pre-alocados alternam entre escrita e leitura:
+        enquanto a UI exibe um, a analise escreve no outro, eliminando a
+        alocacao e a copia integral por frame na passagem de mao.
+        """
+        h, w = frame.shape[:2]
+        scale = min(1280 / w, 720 / h)
+        new_w, new_h = int(w * scale), int(h * scale)
+
+        if (self._ui_buffers is None
+                or self._ui_buffers[0].shape[:2] != (new_h, new_w)):
+            self._ui_buffers = [np.empty((new_h, new_w, 3), dtype=np.uint8)
+                                for _ in range(2)]
+
+        buf = self._ui_buffers[self._ui_write_idx]
+        self._ui_write_idx ^= 1
+        cv2.resize(frame, (new_w, new_h), dst=buf,
+                   interpolation=cv2.INTER_LINEAR)
+
+        with self._latest_lock:
+            self._latest_frame = buf
 
     def _draw_frame(self, frame, tracked_vehicles):
         """Desenha visualizacoes no frame"""
@@ -1053,10 +1609,12 @@ Equipe de monitoramento acionada.
         if self.alerta_flash and self._flash_count % 2 == 1:
             h, w = frame.shape[:2]
 
-            # Overlay vermelho semi-transparente
-            overlay = frame.copy()
-            cv2.rectangle(overlay, (0, 0), (w, h), (0, 0, 255), -1)
-            cv2.addWeighted(overlay, 0.3, frame, 0.7, 0, frame)
+            # Overlay vermelho semi-transparente: um unico addWeighted
+            # contra o frame vermelho constante cacheado, sem copiar
+            # nem pintar o frame inteiro a cada flash
+            if self._red_overlay is None or self._red_overlay.shape != frame.shape:
+                self._red_overlay = np.full_like(frame, (0, 0, 255))
+            cv2.addWeighted(frame, 0.7, self._red_overlay, 0.3, 0, dst=frame)
 
             # Borda vermelha grossa
             cv2.rectangle(frame, (5, 5), (w-5, h-5), (0, 0, 255), 10)
@@ -1078,46 +1636,87 @@ Equipe de monitoramento acionada.
 
         return frame
 
+    def _pump_display(self):
+        """Exibe o frame mais recente publicado pela analise.
+
+        Roda no loop do Tk a ~30 Hz: le-e-limpa o slot e so entao paga
+        a conversao cvtColor + PIL + ImageTk, fora da thread de
+        analise. Sem fila nao ha backlog possivel.
+        """
+        with self._latest_lock:
+            frame = self._latest_frame
+            self._latest_frame = None
+
+        if frame is not None:
+            self._update_ui(frame)
+
+        self.root.after(33, self._pump_display)
+
     def _update_ui(self, frame):
         """Atualiza interface"""
         self._display_frame(frame)
 
         if self.counter:
             stats = self.counter.get_stats()
-            self.stat_entrada.config(text=str(stats['total_entrada']))
-            self.stat_saida.config(text=str(stats['total_saida']))
-            self.stat_total.config(text=str(stats['total_geral']))
+            # Reconfigurar os labels so quando a contagem realmente muda
+            if stats is not self._last_stats:
+                self._last_stats = stats
+                self.stat_entrada.config(text=str(stats['total_entrada']))
+                self.stat_saida.config(text=str(stats['total_saida']))
+                self.stat_total.config(text=str(stats['total_geral']))
 
             # Atualizar fluxo e tipo de transito
             self._update_traffic_info()
 
     def _display_frame(self, frame):
         """Exibe frame"""
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w = frame_rgb.shape[:2]
+        h, w = frame.shape[:2]
 
         # Redimensionar mantendo proporcao - VIDEO GRANDE
         max_w, max_h = 1280, 720
         scale = min(max_w / w, max_h / h)
         new_w, new_h = int(w * scale), int(h * scale)
 
-        frame_resized = cv2.resize(frame_rgb, (new_w, new_h))
-
-        img = Image.fromarray(frame_resized)
-        imgtk = ImageTk.PhotoImage(image=img)
-
-        self.video_canvas.imgtk = imgtk
-        self.video_canvas.config(image=imgtk)
+        # Frames publicados por _publish_frame ja chegam no tamanho de
+        # exibicao; o resize so roda para fontes fora desse caminho
+        ja_no_tamanho = (new_w, new_h) == (w, h)
+
+        if self._use_ocl and self.gpu_display_var.get():
+            # cvtColor/resize rodam via OpenCL em UMat; o download de
+            # volta para a CPU acontece uma vez, ja no tamanho final
+            frame_u = cv2.UMat(frame)
+            if not ja_no_tamanho:
+                # Redimensionar antes: o cvtColor roda sobre menos pixels
+                frame_u = cv2.resize(frame_u, (new_w, new_h))
+            frame_u = cv2.cvtColor(frame_u, cv2.COLOR_BGR2RGB)
+            img = Image.fromarray(frame_u.get())
+        else:
+            # Sem cvtColor: o decoder raw 'BGR' do PIL le o buffer BGR
+            # direto durante a conversao, poupando uma passada completa
+            if not ja_no_tamanho:
+                frame = cv2.resize(frame, (new_w, new_h))
+            img = Image.frombuffer('RGB', (new_w, new_h),
+                                   np.ascontiguousarray(frame),
+                                   'raw', 'BGR', 0, 1)
+
+        # Reutilizar a PhotoImage enquanto o tamanho nao muda: paste()
+        # atualiza os pixels in-place, sem alocar outro objeto Tk
+        if (self._photo is None or self._photo.width() != new_w
+                or self._photo.height() != new_h):
+            self._photo = ImageTk.PhotoImage(image=img)
+            self.video_canvas.config(image=self._photo)
+        else:
+            self._photo.paste(img)
 
     def _update_traffic_info(self):
         """Atualiza informacoes de fluxo e tipo de transito"""
         agora = time.time()
 
-        # Remover contagens mais antigas que 60 segundos
-        self.contagem_ultimo_minuto = [
-            t for t in self.contagem_ultimo_minuto
-            if agora - t <= 60
-        ]
+        # Remover contagens mais antigas que 60 segundos (popleft O(1))
+        cutoff = agora - 60
+        dq = self.contagem_ultimo_minuto
+        while dq and dq[0] < cutoff:
+            dq.popleft()
 
         # Calcular fluxo por minuto
         fluxo = len(self.contagem_ultimo_minuto)
@@ -1143,14 +1742,24 @@ Equipe de monitoramento acionada.
         self.tipo_transito_label.config(text=tipo, foreground=cor)
 
     def _add_log(self, message):
-        """Adiciona mensagem ao log"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_tree.insert('', 0, values=(timestamp, message))
-
-        # Manter apenas ultimos 50
-        children = self.log_tree.get_children()
-        if len(children) > 50:
-            self.log_tree.delete(children[-1])
+        """Registra um evento no buffer; a insercao no Treeview e adiada"""
+        self._log_buffer.append((datetime.now().strftime("%H:%M:%S"), message))
+
+    def _flush_log(self):
+        """Descarrega o buffer de log no Treeview.
+
+        Roda a 10 Hz na thread do Tk: rajadas de eventos viram um punhado
+        de insercoes por flush em vez de uma chamada Tk por evento, e o
+        Treeview fica limitado as 200 linhas mais recentes.
+        """
+        while self._log_buffer:
+            hora, evento = self._log_buffer.popleft()
+            if len(self._log_iids) == self._log_iids.maxlen:
+                self.log_tree.delete(self._log_iids.pop())
+            self._log_iids.appendleft(
+                self.log_tree.insert('', 0, values=(hora, evento)))
+
+        self.root.after(100, self._flush_log)
 
     def run(self):
         """Inicia aplicacao"""
@@ -6,9 +6,10 @@ Calcula métricas avançadas como velocidade estimada,
 tempo de permanência, fluxo por hora, densidade de tráfego.
 """
 
+import math
 import time
 from typing import Dict, List, Optional, Tuple
-from collections import defaultdict
+from collections import defaultdict, deque
 from dataclasses import dataclass, field
 import numpy as np
 
@@ -21,10 +22,11 @@ class VehicleMetrics:
     exit_time: float = 0.0
     entry_position: Tuple[float, float] = (0, 0)
     exit_position: Tuple[float, float] = (0, 0)
-    positions: List[Tuple[float, float, float]] = field(default_factory=list)  # (x, y, timestamp)
+    # (x, y, timestamp); maxlen limita a memoria por veiculo em videos
+    # longos — a velocidade so usa as duas ultimas entradas
+    positions: deque = field(default_factory=lambda: deque(maxlen=16))
     color: str = 'indefinido'
     vehicle_type: str = 'car'
-    speed_estimates: List[float] = field(default_factory=list)
     direction: str = ''
     counted: bool = False
 
@@ -46,17 +48,32 @@ class AdvancedAnalytics:
         # Métricas por veículo
         self.vehicles: Dict[int, VehicleMetrics] = {}
 
+        # Armazem SoA das estatisticas de velocidade: somas correntes
+        # em arrays contiguos (crescimento geometrico) com mapa
+        # track_id -> linha; media e maximo por veiculo saem em O(1) e
+        # agregados de sessao viram uma operacao vetorizada nas fatias
+        self._tid_to_row: Dict[int, int] = {}
+        self._v_count = 0
+        self._v_speed_sum = np.zeros(256, dtype=np.float64)
+        self._v_speed_cnt = np.zeros(256, dtype=np.int64)
+        self._v_speed_max = np.zeros(256, dtype=np.float64)
+
         # Estatísticas globais
         self.total_vehicles = 0
         self.vehicles_in_scene = 0
         self.flow_per_minute: List[Tuple[float, int]] = []
-        self.speed_history: List[float] = []
 
-        # Tempo de permanência
+        # Janela das ultimas 50 velocidades com soma corrente: a media
+        # movel sai em O(1) por consulta, sem refatiar o historico
+        self.speed_history: deque = deque(maxlen=50)
+        self._speed_sum = 0.0
+
+        # Tempo de permanência (soma corrente para média O(1))
         self.dwell_times: List[float] = []
+        self._dwell_sum = 0.0
 
-        # Densidade de tráfego
-        self.density_history: List[Tuple[float, int]] = []
+        # Densidade de tráfego (janela de 5 min descartada via popleft)
+        self.density_history: deque = deque()
 
         # Alertas
         self.alerts: List[Dict] = []
@@ -108,8 +125,31 @@ class AdvancedAnalytics:
         if len(vehicle.positions) >= 2:
             speed = self._calculate_speed(vehicle.positions[-2], vehicle.positions[-1])
             if speed > 0:
-                vehicle.speed_estimates.append(speed)
+                row = self._row_for(track_id)
+                self._v_speed_sum[row] += speed
+                self._v_speed_cnt[row] += 1
+                if speed > self._v_speed_max[row]:
+                    self._v_speed_max[row] = speed
+
+                if len(self.speed_history) == self.speed_history.maxlen:
+                    self._speed_sum -= self.speed_history[0]
                 self.speed_history.append(speed)
+                self._speed_sum += speed
+
+    def _row_for(self, track_id: int) -> int:
+        """Linha SoA do veículo, alocando com crescimento geométrico"""
+        row = self._tid_to_row.get(track_id)
+        if row is None:
+            if self._v_count == len(self._v_speed_sum):
+                for nome in ('_v_speed_sum', '_v_speed_cnt', '_v_speed_max'):
+                    arr = getattr(self, nome)
+                    novo = np.zeros(len(arr) * 2, dtype=arr.dtype)
+                    novo[:self._v_count] = arr[:self._v_count]
+                    setattr(self, nome, novo)
+            row = self._v_count
+            self._tid_to_row[track_id] = row
+            self._v_count += 1
+        return row
 
     def vehicle_exited(self, track_id: int, timestamp: float, direction: str):
         """
@@ -132,6 +172,7 @@ class AdvancedAnalytics:
             # Calcular tempo de permanência
             dwell_time = timestamp - vehicle.entry_time
             self.dwell_times.append(dwell_time)
+            self._dwell_sum += dwell_time
 
             self.vehicles_in_scene = max(0, self.vehicles_in_scene - 1)
 
@@ -150,10 +191,11 @@ class AdvancedAnalytics:
 
         dt = t2 - t1
         if dt <= 0:
-            return 0
+            return 0.0
 
-        # Distância em pixels
-        distance_pixels = np.sqrt((x2 - x1)**2 + (y2 - y1)**2)
+        # Distância em pixels (math.hypot evita o dispatch numpy
+        # para escalares)
+        distance_pixels = math.hypot(x2 - x1, y2 - y1)
 
         # Converter para metros
         distance_meters = distance_pixels / self.pixels_per_meter
@@ -163,7 +205,9 @@ class AdvancedAnalytics:
         speed_kmh = speed_ms * 3.6
 
         # Limitar a valores razoáveis (0-200 km/h)
-        return min(max(speed_kmh, 0), 200)
+        if speed_kmh <= 0.0:
+            return 0.0
+        return speed_kmh if speed_kmh < 200.0 else 200.0
 
     def _check_alerts(self, vehicle: VehicleMetrics, dwell_time: float):
         """Verifica e gera alertas baseados nas métricas"""
@@ -178,8 +222,9 @@ class AdvancedAnalytics:
             })
 
         # Alerta de alta velocidade
-        if vehicle.speed_estimates:
-            avg_speed = np.mean(vehicle.speed_estimates)
+        row = self._tid_to_row.get(vehicle.track_id)
+        if row is not None and self._v_speed_cnt[row] > 0:
+            avg_speed = self._v_speed_sum[row] / self._v_speed_cnt[row]
             if avg_speed > 80:  # Acima de 80 km/h
                 self.alerts.append({
                     'type': 'ALTA_VELOCIDADE',
@@ -195,21 +240,21 @@ class AdvancedAnalytics:
 
         # Manter apenas últimos 5 minutos
         cutoff = timestamp - 300
-        self.density_history = [(t, c) for t, c in self.density_history if t > cutoff]
+        while self.density_history and self.density_history[0][0] <= cutoff:
+            self.density_history.popleft()
 
     def get_average_speed(self) -> float:
         """Retorna velocidade média atual"""
         if not self.speed_history:
             return 0
-        # Média das últimas 50 medições
-        recent = self.speed_history[-50:]
-        return np.mean(recent)
+        # Média das últimas 50 medições via soma corrente
+        return self._speed_sum / len(self.speed_history)
 
     def get_average_dwell_time(self) -> float:
         """Retorna tempo médio de permanência"""
         if not self.dwell_times:
             return 0
-        return np.mean(self.dwell_times)
+        return self._dwell_sum / len(self.dwell_times)
 
     def get_current_flow_rate(self) -> float:
         """Retorna taxa de fluxo atual (veículos/minuto)"""
@@ -258,8 +303,13 @@ class AdvancedAnalytics:
 
         vehicle = self.vehicles[track_id]
 
-        avg_speed = np.mean(vehicle.speed_estimates) if vehicle.speed_estimates else 0
-        max_speed = max(vehicle.speed_estimates) if vehicle.speed_estimates else 0
+        row = self._tid_to_row.get(track_id)
+        if row is not None and self._v_speed_cnt[row] > 0:
+            avg_speed = self._v_speed_sum[row] / self._v_speed_cnt[row]
+            max_speed = self._v_speed_max[row]
+        else:
+            avg_speed = 0
+            max_speed = 0
 
         dwell_time = vehicle.exit_time - vehicle.entry_time if vehicle.exit_time else 0
 
@@ -294,11 +344,20 @@ class AdvancedAnalytics:
     def reset(self):
         """Reseta todas as métricas"""
         self.vehicles.clear()
+        self._tid_to_row.clear()
+        self._v_count = 0
+        # Zerar os acumuladores por linha: _row_for reentrega as mesmas
+        # linhas apos o reset e o += herdaria somas da sessao anterior
+        self._v_speed_sum[:] = 0.0
+        self._v_speed_cnt[:] = 0
+        self._v_speed_max[:] = 0.0
         self.total_vehicles = 0
         self.vehicles_in_scene = 0
         self.flow_per_minute.clear()
         self.speed_history.clear()
+        self._speed_sum = 0.0
         self.dwell_times.clear()
+        self._dwell_sum = 0.0
         self.density_history.clear()
         self.alerts.clear()
         self.hourly_flow.clear()
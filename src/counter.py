@@ -8,10 +8,13 @@ linhas de referência e tracking de trajetória.
 
 import cv2
 import numpy as np
-from typing import Dict, List, Set, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 from collections import defaultdict
 from dataclasses import dataclass, field
 
+from src.color_classifier import color_name
+from src.draw_ops import blend_color_roi
+
 
 @dataclass
 class VehicleRecord:
@@ -50,15 +53,67 @@ class VehicleCounter:
         # Zona de contagem (margem acima e abaixo da linha)
         self.zone_margin = int(frame_height * 0.05)
 
-        # Veículos já contados (evitar duplicidade)
-        self.counted_vehicles: Set[int] = set()
-
-        # Histórico de posições para determinar direção
-        self.position_history: Dict[int, List[float]] = defaultdict(list)
+        # Bandas [y_lo, y_hi] das zonas, ordenadas por borda inferior:
+        # o teste "em alguma zona?" sai por np.searchsorted, num formato
+        # que estende a varias linhas de contagem sem comparar cada
+        # track contra cada linha
+        self._line_bands = np.array(
+            [[self.line_y - self.zone_margin,
+              self.line_y + self.zone_margin]], dtype=np.float32)
+
+        # Veículos já contados (evitar duplicidade): os ids do ByteTrack
+        # sao inteiros pequenos e crescentes, entao um bitset booleano
+        # da a consulta por carga indexada, sem hashing, e permite
+        # mascarar todos os ids do frame de uma vez
+        self._counted = np.zeros(1024, dtype=bool)
+
+        # Histórico de posições para determinar direção: anel fixo de
+        # 30 amostras float32 por track (escrita O(1) sem realocar
+        # lista; as médias de direção saem via NumPy)
+        self._pos_buf: Dict[int, np.ndarray] = {}
+        self._pos_idx: Dict[int, int] = {}
+
+        # Despejo de tracks frios: sem isso os dicts por track crescem
+        # com todo id ja visto num video longo (o bitset _counted fica,
+        # pois custa 1 byte por id)
+        self._frame_id = 0
+        self._last_seen: Dict[int, int] = {}
+
+        # Somas correntes das duas metades da janela por track
+        # [sum_lo, n_lo, sum_hi, n_hi]: cada amostra nova custa O(1) de
+        # ajustes e a pontuacao de direcao vira duas divisoes, sem
+        # revarrer as 30 posicoes a cada frame
+        self._dir_sums: Dict[int, list] = {}
 
         # Estatísticas
         self.stats = CountingStats()
 
+        # Totais por cor em array denso, incrementado na contagem:
+        # get_color_distribution vira uma leitura O(cores) sem iterar
+        # os dicts aninhados de por_cor a cada refresh do dashboard
+        self._color_idx: Dict[str, int] = {}
+        self._color_totals = np.zeros(16, dtype=np.int64)
+
+        # Indice reverso dos registros por cor e por tipo (posicoes na
+        # lista registros): consultas filtradas saem em O(resultados)
+        # em vez de varrer a lista inteira
+        self._by_color: Dict[str, List[int]] = {}
+        self._by_type: Dict[str, List[int]] = {}
+
+        # Snapshot cacheado de get_stats(), invalidado a cada contagem
+        self._stats_snapshot = None
+
+        # Chrome estatico do draw_counting_line (linha + label)
+        # rasterizado uma unica vez: (ys, xs, valores) para blit direto
+        self._chrome_pixels = None
+        self._chrome_shape = None
+
+        # Painel de estatisticas: rotulos fixos rasterizados uma vez e
+        # numeros re-rasterizados so quando os totais mudam
+        self._stats_labels = None
+        self._stats_values = None
+        self._stats_drawn = None
+
     def update(self, tracked_vehicles: List[Dict], colors: Dict[int, str],
                timestamp: float = 0.0) -> List[Tuple[int, str]]:
         """
@@ -74,89 +129,167 @@ class VehicleCounter:
         """
         newly_counted = []
 
-        for vehicle in tracked_vehicles:
-            track_id = vehicle.get('track_id', -1)
-            if track_id < 0:
-                continue
-
-            bbox = vehicle['bbox']
-            center_y = (bbox[1] + bbox[3]) / 2
-
-            # Atualizar histórico de posições
-            self.position_history[track_id].append(center_y)
-
-            # Manter apenas últimas 30 posições
-            if len(self.position_history[track_id]) > 30:
-                self.position_history[track_id] = self.position_history[track_id][-30:]
-
-            # Verificar se veículo já foi contado
-            if track_id in self.counted_vehicles:
-                continue
-
-            # Verificar se cruzou a linha de contagem
-            if self._crossed_line(track_id, center_y):
-                direction = self._get_direction(track_id)
-
-                if direction:
-                    self.counted_vehicles.add(track_id)
-
-                    color = colors.get(track_id, 'indefinido')
-                    vehicle_type = vehicle.get('class_name', 'car')
-
-                    # Registrar contagem
-                    record = VehicleRecord(
-                        track_id=track_id,
-                        direction=direction,
-                        color=color,
-                        vehicle_type=vehicle_type,
-                        timestamp=timestamp
-                    )
-                    self.stats.registros.append(record)
-
-                    # Atualizar estatísticas
-                    if direction == 'entrada':
-                        self.stats.total_entrada += 1
-                    else:
-                        self.stats.total_saida += 1
-
-                    self.stats.por_cor[color][direction] += 1
-                    self.stats.por_tipo[vehicle_type][direction] += 1
-
-                    newly_counted.append((track_id, direction))
+        if not tracked_vehicles:
+            return newly_counted
+
+        self._frame_id += 1
+
+        # Triagem vetorizada: centros, zona de contagem e ids validos
+        # saem em poucas operacoes NumPy; so o punhado de candidatos
+        # sobreviventes passa pelo caminho Python de direcao/registro
+        ids = np.fromiter((v.get('track_id', -1) for v in tracked_vehicles),
+                          dtype=np.int64, count=len(tracked_vehicles))
+        bboxes = np.asarray([v['bbox'] for v in tracked_vehicles],
+                            dtype=np.float32)
+        centers = (bboxes[:, 1] + bboxes[:, 3]) * 0.5
+
+        valid = ids >= 0
+
+        # Atualizar histórico de posições (anel sobrescreve a mais
+        # antiga das 30 amostras) e as somas incrementais das metades
+        for i in np.flatnonzero(valid):
+            track_id = int(ids[i])
+            y = float(centers[i])
+            buf = self._pos_buf.get(track_id)
+            if buf is None:
+                buf = self._pos_buf[track_id] = np.empty(30, dtype=np.float32)
+                self._pos_idx[track_id] = 0
+                self._dir_sums[track_id] = [0.0, 0, 0.0, 0]
+            idx = self._pos_idx[track_id]
+            st = self._dir_sums[track_id]
+
+            if idx < 30:
+                # Janela crescendo: a amostra entra na metade alta e a
+                # fronteira migra para a baixa conforme a metade cresce
+                st[2] += y
+                st[3] += 1
+                half = (idx + 1) // 2
+                while st[1] < half:
+                    borda = float(buf[st[1]])
+                    st[2] -= borda
+                    st[3] -= 1
+                    st[0] += borda
+                    st[1] += 1
+            else:
+                # Janela cheia: sai a mais antiga da metade baixa, a
+                # fronteira desce de metade e a amostra nova entra
+                antiga = float(buf[idx % 30])
+                borda = float(buf[(idx - 15) % 30])
+                st[0] += borda - antiga
+                st[2] += y - borda
+
+            buf[idx % 30] = y
+            self._pos_idx[track_id] = idx + 1
+            self._last_seen[track_id] = self._frame_id
+
+        if self._frame_id % 300 == 0:
+            limite = self._frame_id - 300
+            stale = [tid for tid, visto in self._last_seen.items()
+                     if visto < limite]
+            for tid in stale:
+                self._pos_buf.pop(tid, None)
+                self._pos_idx.pop(tid, None)
+                self._dir_sums.pop(tid, None)
+                del self._last_seen[tid]
+
+        # Os dashboards movem line_y/zone_margin ao vivo pelo slider da
+        # linha: refazer a banda a partir dos valores atuais (escrita
+        # in-place num array 1x2, custo desprezivel)
+        self._line_bands[0, 0] = self.line_y - self.zone_margin
+        self._line_bands[0, 1] = self.line_y + self.zone_margin
+
+        # Banda candidata de cada centro (a unica cujo y_lo e menor que
+        # ele); basta conferir a borda superior dessa banda
+        banda = np.searchsorted(self._line_bands[:, 0], centers) - 1
+        in_zone = ((banda >= 0) &
+                   (centers < self._line_bands[np.maximum(banda, 0), 1]))
+
+        # Sem ninguem na zona (o comum entre veiculos), o historico ja
+        # foi atualizado e nada mais ha a fazer neste frame
+        if not in_zone.any():
+            return newly_counted
+
+        # Descartar em bloco os ja contados (mascara indexada por id)
+        if ids.max() >= self._counted.size:
+            self._grow_counted(int(ids.max()))
+        not_counted = ~self._counted[np.where(valid, ids, 0)]
+
+        survivors = np.flatnonzero(valid & in_zone & not_counted)
+        if survivors.size == 0:
+            return newly_counted
+
+        # Pontuar a direcao de todos os sobreviventes de uma vez:
+        # as somas correntes das metades viram duas colunas de divisoes
+        # vetorizadas, sem uma chamada Python de _get_direction por track
+        sums = np.array([self._dir_sums[int(ids[i])] for i in survivors],
+                        dtype=np.float64)
+        idxs = np.fromiter((self._pos_idx[int(ids[i])] for i in survivors),
+                           dtype=np.int64, count=survivors.size)
+        prontos = (idxs >= 5) & (sums[:, 1] > 0) & (sums[:, 3] > 0)
+        movement = np.zeros(survivors.size)
+        np.divide(sums[:, 2], sums[:, 3], out=movement, where=prontos)
+        movement -= np.divide(sums[:, 0], sums[:, 1],
+                              out=np.zeros(survivors.size), where=prontos)
+
+        # >20 px movendo para baixo = entrada; <-20 para cima = saida
+        codigos = np.where(movement > 20, 1, np.where(movement < -20, -1, 0))
+        codigos[~prontos] = 0
+
+        for j in np.flatnonzero(codigos):
+            i = int(survivors[j])
+            track_id = int(ids[i])
+            vehicle = tracked_vehicles[i]
+
+            direction = 'entrada' if codigos[j] > 0 else 'saida'
+            self._counted[track_id] = True
+
+            # Aceita dict track_id->nome ou ndarray de ids compactos
+            if isinstance(colors, np.ndarray):
+                color = color_name(int(colors[track_id])
+                                   if track_id < len(colors) else -1)
+            else:
+                color = colors.get(track_id, 'indefinido')
+            vehicle_type = vehicle.get('class_name', 'car')
+
+            # Registrar contagem
+            record = VehicleRecord(
+                track_id=track_id,
+                direction=direction,
+                color=color,
+                vehicle_type=vehicle_type,
+                timestamp=timestamp
+            )
+            reg_idx = len(self.stats.registros)
+            self.stats.registros.append(record)
+            self._by_color.setdefault(color, []).append(reg_idx)
+            self._by_type.setdefault(vehicle_type, []).append(reg_idx)
+
+            # Atualizar estatísticas
+            if direction == 'entrada':
+                self.stats.total_entrada += 1
+            else:
+                self.stats.total_saida += 1
+
+            self.stats.por_cor[color][direction] += 1
+            self.stats.por_tipo[vehicle_type][direction] += 1
+
+            cidx = self._color_idx.setdefault(color, len(self._color_idx))
+            if cidx >= self._color_totals.size:
+                self._color_totals = np.resize(self._color_totals,
+                                               2 * self._color_totals.size)
+            self._color_totals[cidx] += 1
+
+            self._stats_snapshot = None
+
+            newly_counted.append((track_id, direction))
 
         return newly_counted
 
-    def _crossed_line(self, track_id: int, current_y: float) -> bool:
-        """Verifica se o veículo está na zona de contagem"""
-        return abs(current_y - self.line_y) < self.zone_margin
-
-    def _get_direction(self, track_id: int) -> Optional[str]:
-        """
-        Determina a direção do movimento do veículo.
-
-        Returns:
-            'entrada' (movendo para baixo), 'saida' (movendo para cima) ou None
-        """
-        positions = self.position_history.get(track_id, [])
-
-        if len(positions) < 5:
-            return None
-
-        # Analisar movimento
-        start_positions = positions[:len(positions)//2]
-        end_positions = positions[len(positions)//2:]
-
-        avg_start = sum(start_positions) / len(start_positions)
-        avg_end = sum(end_positions) / len(end_positions)
-
-        movement = avg_end - avg_start
-
-        if movement > 20:  # Movendo para baixo (y aumenta)
-            return 'entrada'
-        elif movement < -20:  # Movendo para cima (y diminui)
-            return 'saida'
-
-        return None
+    def _grow_counted(self, track_id: int):
+        """Cresce o bitset de contados até cobrir track_id"""
+        novo = np.zeros(max(track_id + 1, 2 * self._counted.size), dtype=bool)
+        novo[:self._counted.size] = self._counted
+        self._counted = novo
 
     def draw_counting_line(self, frame: np.ndarray) -> np.ndarray:
         """
@@ -170,21 +303,30 @@ class VehicleCounter:
         """
         height, width = frame.shape[:2]
 
-        # Linha principal de contagem
-        cv2.line(frame, (0, self.line_y), (width, self.line_y),
-                 (0, 255, 255), 3)
-
-        # Zona de contagem (área semi-transparente)
-        overlay = frame.copy()
-        cv2.rectangle(overlay,
-                      (0, self.line_y - self.zone_margin),
-                      (width, self.line_y + self.zone_margin),
-                      (0, 255, 255), -1)
-        cv2.addWeighted(overlay, 0.1, frame, 0.9, 0, frame)
-
-        # Labels
-        cv2.putText(frame, "LINHA DE CONTAGEM", (10, self.line_y - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+        # Zona de contagem (área semi-transparente): blend apenas no
+        # ROI da faixa, sem copiar nem repintar o frame inteiro
+        blend_color_roi(frame,
+                        0, max(0, self.line_y - self.zone_margin),
+                        width, min(height, self.line_y + self.zone_margin),
+                        0, 255, 255, 0.1)
+
+        # Linha e label mudam so quando a resolucao ou a posicao da
+        # linha muda (slider nos dashboards): rasterizar uma vez por
+        # chave (cv2.line e putText sao caros por frame) e copiar so
+        # os pixels desenhados
+        chave = (height, width, self.line_y, self.zone_margin)
+        if self._chrome_pixels is None or self._chrome_shape != chave:
+            chrome = np.zeros((height, width, 3), dtype=np.uint8)
+            cv2.line(chrome, (0, self.line_y), (width, self.line_y),
+                     (0, 255, 255), 3)
+            cv2.putText(chrome, "LINHA DE CONTAGEM", (10, self.line_y - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+            ys, xs = np.nonzero(chrome.any(axis=2))
+            self._chrome_pixels = (ys, xs, chrome[ys, xs])
+            self._chrome_shape = chave
+
+        ys, xs, valores = self._chrome_pixels
+        frame[ys, xs] = valores
 
         return frame
 
@@ -198,43 +340,89 @@ class VehicleCounter:
         Returns:
             Frame com estatísticas
         """
-        # Fundo semi-transparente para estatísticas
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (10, 10), (300, 120), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
-
-        # Textos
-        cv2.putText(frame, "SIMV - Contagem de Veiculos", (20, 35),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-
-        cv2.putText(frame, f"Entrada: {self.stats.total_entrada}", (20, 65),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-
-        cv2.putText(frame, f"Saida: {self.stats.total_saida}", (20, 95),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        # Fundo semi-transparente para estatísticas (blend so no ROI)
+        blend_color_roi(frame, 10, 10, 300, 120, 0, 0, 0, 0.7)
+
+        # Rotulos fixos: rasterizar o texto uma unica vez e blitar so
+        # os pixels desenhados (putText e rasterizacao de glifos cara)
+        if self._stats_labels is None:
+            painel = np.zeros((120, 300, 3), dtype=np.uint8)
+            cv2.putText(painel, "SIMV - Contagem de Veiculos", (20, 35),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+            cv2.putText(painel, "Entrada:", (20, 65),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            cv2.putText(painel, "Saida:", (20, 95),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+            ys, xs = np.nonzero(painel.any(axis=2))
+            self._stats_labels = (ys, xs, painel[ys, xs])
+
+        ys, xs, valores = self._stats_labels
+        frame[ys, xs] = valores
+
+        # Numeros: so re-rasterizar quando os totais mudam; entre
+        # contagens o frame recebe o blit do cache
+        atuais = (self.stats.total_entrada, self.stats.total_saida)
+        if self._stats_drawn != atuais:
+            painel = np.zeros((120, 300, 3), dtype=np.uint8)
+            cv2.putText(painel, str(atuais[0]), (135, 65),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            cv2.putText(painel, str(atuais[1]), (115, 95),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+            ys, xs = np.nonzero(painel.any(axis=2))
+            self._stats_values = (ys, xs, painel[ys, xs])
+            self._stats_drawn = atuais
+
+        ys, xs, valores = self._stats_values
+        frame[ys, xs] = valores
 
         return frame
 
     def get_stats(self) -> Dict:
-        """Retorna estatísticas em formato de dicionário"""
-        return {
-            'total_entrada': self.stats.total_entrada,
-            'total_saida': self.stats.total_saida,
-            'total_geral': self.stats.total_entrada + self.stats.total_saida,
-            'por_cor': dict(self.stats.por_cor),
-            'por_tipo': dict(self.stats.por_tipo),
-            'registros': len(self.stats.registros)
-        }
+        """Retorna estatísticas em formato de dicionário.
+
+        O dicionário é reconstruído apenas quando uma nova contagem
+        acontece; entre contagens a chamada é O(1), o que mantém o
+        callback de UI barato mesmo chamando a cada frame.
+        """
+        if self._stats_snapshot is None:
+            self._stats_snapshot = {
+                'total_entrada': self.stats.total_entrada,
+                'total_saida': self.stats.total_saida,
+                'total_geral': self.stats.total_entrada + self.stats.total_saida,
+                'por_cor': dict(self.stats.por_cor),
+                'por_tipo': dict(self.stats.por_tipo),
+                'registros': len(self.stats.registros)
+            }
+        return self._stats_snapshot
+
+    def registros_by_color(self, color: str) -> List[VehicleRecord]:
+        """Retorna os registros de uma cor, via índice reverso"""
+        return [self.stats.registros[i]
+                for i in self._by_color.get(color, ())]
+
+    def registros_by_type(self, vehicle_type: str) -> List[VehicleRecord]:
+        """Retorna os registros de um tipo de veículo, via índice reverso"""
+        return [self.stats.registros[i]
+                for i in self._by_type.get(vehicle_type, ())]
 
     def get_color_distribution(self) -> Dict[str, int]:
         """Retorna distribuição total de cores"""
-        distribution = {}
-        for color, counts in self.stats.por_cor.items():
-            distribution[color] = counts['entrada'] + counts['saida']
-        return distribution
+        return {color: int(self._color_totals[idx])
+                for color, idx in self._color_idx.items()}
 
     def reset(self):
         """Reseta todas as contagens"""
-        self.counted_vehicles.clear()
-        self.position_history.clear()
+        self._counted[:] = False
+        self._pos_buf.clear()
+        self._pos_idx.clear()
+        self._dir_sums.clear()
+        self._frame_id = 0
+        self._last_seen.clear()
         self.stats = CountingStats()
+        self._color_idx.clear()
+        self._color_totals[:] = 0
+        self._by_color.clear()
+        self._by_type.clear()
+        self._stats_snapshot = None
+        self._chrome_pixels = None
+        self._chrome_shape = None
@@ -0,0 +1,87 @@
+"""
+Módulo de Operações de Desenho Compiladas
+Sistema Inteligente de Monitoramento Veicular (SIMV)
+
+Concentra o caminho quente de rasterização por frame em um único módulo
+compilado com Numba (njit + cache em disco) quando a biblioteca está
+instalada, com fallback equivalente em OpenCV puro. Chamadores usam as
+funções daqui sem precisar testar a disponibilidade do compilador.
+"""
+
+import cv2
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_DISPONIVEL = True
+except ImportError:
+    NUMBA_DISPONIVEL = False
+
+
+if NUMBA_DISPONIVEL:
+    @njit(parallel=True, cache=True)
+    def blend_dark_roi(frame, x0, y0, x1, y1, alpha):
+        """Escurece um ROI in-place: pixel = (1 - alpha) * pixel"""
+        keep = 1.0 - alpha
+        for y in prange(y0, y1):
+            for x in range(x0, x1):
+                for c in range(3):
+                    frame[y, x, c] = np.uint8(frame[y, x, c] * keep)
+
+    @njit(parallel=True, cache=True)
+    def blend_color_roi(frame, x0, y0, x1, y1, b, g, r, alpha):
+        """Mistura uma cor solida sobre um ROI in-place (alpha blend)"""
+        keep = 1.0 - alpha
+        for y in prange(y0, y1):
+            for x in range(x0, x1):
+                frame[y, x, 0] = np.uint8(frame[y, x, 0] * keep + b * alpha)
+                frame[y, x, 1] = np.uint8(frame[y, x, 1] * keep + g * alpha)
+                frame[y, x, 2] = np.uint8(frame[y, x, 2] * keep + r * alpha)
+
+    @njit(parallel=True, cache=True)
+    def draw_bbox_borders(frame, bboxes, colors, thickness):
+        """Desenha as bordas de N bboxes em paralelo, direto no buffer"""
+        h, w = frame.shape[:2]
+
+        for i in prange(bboxes.shape[0]):
+            x1 = max(0, bboxes[i, 0])
+            y1 = max(0, bboxes[i, 1])
+            x2 = min(w - 1, bboxes[i, 2])
+            y2 = min(h - 1, bboxes[i, 3])
+
+            for t in range(thickness):
+                yt = min(h - 1, y1 + t)
+                yb = max(0, y2 - t)
+                for x in range(x1, x2 + 1):
+                    for c in range(3):
+                        frame[yt, x, c] = colors[i, c]
+                        frame[yb, x, c] = colors[i, c]
+
+                xl = min(w - 1, x1 + t)
+                xr = max(0, x2 - t)
+                for y in range(y1, y2 + 1):
+                    for c in range(3):
+                        frame[y, xl, c] = colors[i, c]
+                        frame[y, xr, c] = colors[i, c]
+
+else:
+    def blend_dark_roi(frame, x0, y0, x1, y1, alpha):
+        """Escurece um ROI in-place: pixel = (1 - alpha) * pixel"""
+        roi = frame[y0:y1, x0:x1]
+        cv2.addWeighted(roi, 1.0 - alpha, roi, 0.0, 0, dst=roi)
+
+    def blend_color_roi(frame, x0, y0, x1, y1, b, g, r, alpha):
+        """Mistura uma cor solida sobre um ROI in-place (alpha blend)"""
+        roi = frame[y0:y1, x0:x1]
+        cor = np.empty_like(roi)
+        cor[:] = (b, g, r)
+        cv2.addWeighted(roi, 1.0 - alpha, cor, alpha, 0, dst=roi)
+
+    def draw_bbox_borders(frame, bboxes, colors, thickness):
+        """Desenha as bordas de N bboxes com cv2.rectangle"""
+        for i in range(bboxes.shape[0]):
+            color = (int(colors[i, 0]), int(colors[i, 1]), int(colors[i, 2]))
+            cv2.rectangle(frame,
+                          (int(bboxes[i, 0]), int(bboxes[i, 1])),
+                          (int(bboxes[i, 2]), int(bboxes[i, 3])),
+                          color, thickness)
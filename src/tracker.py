@@ -8,8 +8,11 @@ garantindo que cada veículo seja contado apenas uma vez.
 
 import supervision as sv
 import numpy as np
+from collections import deque
 from typing import Dict, List, Any, Optional
 
+from src.detector import DetectionBatch, VEHICLE_CLASSES
+
 
 class VehicleTracker:
     """Rastreador de veículos usando ByteTrack via supervision"""
@@ -24,68 +27,134 @@ class VehicleTracker:
         )
         self.tracked_vehicles: Dict[int, Dict[str, Any]] = {}
 
-    def update(self, detections: List[Dict], frame: np.ndarray) -> List[Dict]:
+        # Última saída do update, base da extrapolação quando o
+        # detector é pulado em alguns frames
+        self._last_output: List[Dict] = []
+
+        # Ultimo frame em que cada track apareceu: tracks frios sao
+        # descartados periodicamente para o dict nao crescer com todo
+        # id ja visto ao longo de um video longo
+        self._frame_id = 0
+        self._last_seen_frame: Dict[int, int] = {}
+
+    def update(self, detections: Optional[DetectionBatch], frame: np.ndarray) -> List[Dict]:
         """
         Atualiza o tracker com novas detecções.
 
         Args:
-            detections: Lista de detecções do detector
+            detections: DetectionBatch do detector, ou None para um
+                frame sem inferência (as caixas são extrapoladas pela
+                velocidade recente de cada track)
             frame: Frame atual para referência
 
         Returns:
             Lista de detecções com IDs de tracking
         """
-        if not detections:
+        if detections is None:
+            return self.predict()
+
+        self._frame_id += 1
+
+        if len(detections) == 0:
             # Criar detecção vazia para manter o tracker atualizado
             empty_detections = sv.Detections.empty()
             self.tracker.update_with_detections(empty_detections)
             return []
 
-        # Converter detecções para formato supervision
-        xyxy = np.array([d['bbox'] for d in detections])
-        confidence = np.array([d['confidence'] for d in detections])
-        class_id = np.array([d['class_id'] for d in detections])
-
+        # As colunas do DetectionBatch entram direto no supervision,
+        # sem materializar listas intermediárias
         sv_detections = sv.Detections(
-            xyxy=xyxy,
-            confidence=confidence,
-            class_id=class_id
+            xyxy=detections.xyxy.astype(np.float64, copy=False),
+            confidence=detections.conf,
+            class_id=detections.class_id
         )
 
         # Atualizar tracker
         tracked_detections = self.tracker.update_with_detections(sv_detections)
 
-        # Converter de volta para formato de lista
+        # Converter de volta para formato de lista: cada coluna vira
+        # escalares Python num unico .tolist() (uma passada em C), em
+        # vez de int()/float()/tolist() por linha no loop
         tracked_list = []
-        if len(tracked_detections) > 0:
-            for i in range(len(tracked_detections)):
-                track_id = int(tracked_detections.tracker_id[i]) if tracked_detections.tracker_id is not None else -1
-
+        n = len(tracked_detections)
+        if n > 0:
+            xyxy = tracked_detections.xyxy
+            tids = (tracked_detections.tracker_id.tolist()
+                    if tracked_detections.tracker_id is not None else [-1] * n)
+            classes = (tracked_detections.class_id.tolist()
+                       if tracked_detections.class_id is not None else [2] * n)
+            confs = (tracked_detections.confidence.tolist()
+                     if tracked_detections.confidence is not None else [0.5] * n)
+            bboxes = xyxy.tolist()
+            centers_y = ((xyxy[:, 1] + xyxy[:, 3]) * 0.5).tolist()
+
+            for track_id, class_id, conf, bbox, center_y in zip(
+                    tids, classes, confs, bboxes, centers_y):
                 tracked_list.append({
-                    'bbox': tracked_detections.xyxy[i].tolist(),
-                    'class_id': int(tracked_detections.class_id[i]) if tracked_detections.class_id is not None else 2,
-                    'class_name': detections[0]['class_name'] if detections else 'car',
-                    'confidence': float(tracked_detections.confidence[i]) if tracked_detections.confidence is not None else 0.5,
+                    'bbox': bbox,
+                    'class_id': class_id,
+                    'class_name': VEHICLE_CLASSES.get(class_id, 'car'),
+                    'confidence': conf,
                     'track_id': track_id
                 })
 
                 # Armazenar informações do veículo rastreado
-                if track_id not in self.tracked_vehicles:
-                    self.tracked_vehicles[track_id] = {
+                info = self.tracked_vehicles.get(track_id)
+                if info is None:
+                    info = self.tracked_vehicles[track_id] = {
                         'first_seen': True,
-                        'positions': [],
+                        'positions': deque(maxlen=30),
                         'color': None
                     }
                 else:
-                    self.tracked_vehicles[track_id]['first_seen'] = False
+                    info['first_seen'] = False
 
                 # Guardar posição central do veículo
-                bbox = tracked_detections.xyxy[i]
-                center_y = (bbox[1] + bbox[3]) / 2
-                self.tracked_vehicles[track_id]['positions'].append(center_y)
-
+                info['positions'].append(center_y)
+                self._last_seen_frame[track_id] = self._frame_id
+
+        # Despejo periodico de tracks frios: alem do lost_track_buffer
+        # o ByteTrack nao reaproveita o id, entao o estado por veiculo
+        # pode ser liberado sem afetar a contagem
+        if self._frame_id % 300 == 0:
+            limite = self._frame_id - 30
+            stale = [tid for tid, visto in self._last_seen_frame.items()
+                     if visto < limite]
+            for tid in stale:
+                self.tracked_vehicles.pop(tid, None)
+                del self._last_seen_frame[tid]
+
+        self._last_output = tracked_list
         return tracked_list
 
+    def predict(self) -> List[Dict]:
+        """
+        Avança os tracks um frame sem rodar o detector.
+
+        Extrapola cada bbox pela velocidade vertical recente do track
+        (diferença das duas últimas posições), mantendo IDs vivos e o
+        histórico de posições coerente para a contagem de cruzamentos.
+        """
+        predicted = []
+        for vehicle in self._last_output:
+            track_id = vehicle.get('track_id', -1)
+            info = self.tracked_vehicles.get(track_id)
+
+            vy = 0.0
+            if info and len(info['positions']) >= 2:
+                vy = info['positions'][-1] - info['positions'][-2]
+
+            bbox = vehicle['bbox']
+            novo = dict(vehicle)
+            novo['bbox'] = [bbox[0], bbox[1] + vy, bbox[2], bbox[3] + vy]
+            predicted.append(novo)
+
+            if info is not None:
+                info['positions'].append((novo['bbox'][1] + novo['bbox'][3]) / 2)
+
+        self._last_output = predicted
+        return predicted
+
     def get_vehicle_direction(self, track_id: int) -> Optional[str]:
         """
         Determina a direção do movimento de um veículo.
@@ -104,7 +173,7 @@ class VehicleTracker:
             return None
 
         # Calcular direção média do movimento
-        recent_positions = positions[-10:]
+        recent_positions = list(positions)[-10:]
         if len(recent_positions) >= 2:
             movement = recent_positions[-1] - recent_positions[0]
             if movement > 10:
@@ -127,10 +196,19 @@ class VehicleTracker:
 
     def reset(self):
         """Reseta o tracker"""
-        self.tracker = sv.ByteTrack(
-            track_activation_threshold=0.25,
-            lost_track_buffer=30,
-            minimum_matching_threshold=0.8,
-            frame_rate=30
-        )
+        if hasattr(self.tracker, 'reset'):
+            # Zera o estado interno do ByteTrack in-place (listas de
+            # tracks, contador de ids e frame_id), sem reconstruir o
+            # objeto nem realocar buffers a cada video processado
+            self.tracker.reset()
+        else:
+            self.tracker = sv.ByteTrack(
+                track_activation_threshold=0.25,
+                lost_track_buffer=30,
+                minimum_matching_threshold=0.8,
+                frame_rate=30
+            )
         self.tracked_vehicles.clear()
+        self._last_output = []
+        self._frame_id = 0
+        self._last_seen_frame.clear()
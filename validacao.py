@@ -7,17 +7,69 @@ a contagem automatica com a contagem manual (ground truth).
 """
 
 import cv2
+import numpy as np
+import queue
+import select
+import sys
+import threading
 import time
 import json
 from pathlib import Path
+
+try:
+    import orjson
+    ORJSON_DISPONIVEL = True
+except ImportError:
+    ORJSON_DISPONIVEL = False
 from datetime import datetime
 from src.detector import VehicleDetector
 from src.tracker import VehicleTracker
-from src.color_classifier import ColorClassifier
+from src.color_classifier import (ColorClassifier, COLOR_BGR_TABLE,
+                                  COLOR_IDS)
 from src.counter import VehicleCounter
+from src.draw_ops import blend_color_roi, draw_bbox_borders
+
+
+def _abrir_video(video_path):
+    """Abre o video com backend FFmpeg explicito e buffer minimo.
+
+    O hint de aceleracao por hardware (quando o OpenCV expoe a prop)
+    decodifica h.264/h.265 em NVDEC/VAAPI; BUFFERSIZE=1 evita que o
+    backend acumule frames decodificados a frente do consumo.
+    """
+    if hasattr(cv2, 'CAP_PROP_HW_ACCELERATION'):
+        cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG,
+                               [cv2.CAP_PROP_HW_ACCELERATION,
+                                cv2.VIDEO_ACCELERATION_ANY])
+    else:
+        cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+
+    if not cap.isOpened():
+        cap = cv2.VideoCapture(video_path)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+def preparar_modulos():
+    """Cria e aquece os modulos pesados uma unica vez.
+
+    Carregar os pesos do YOLO e montar o contexto de inferencia custa
+    segundos; validando varios videos (ou reprocessando com outra
+    linha), os mesmos modulos sao reaproveitados. O forward com um
+    frame vazio dispara a selecao de algoritmos do cuDNN na carga.
+    """
+    detector = VehicleDetector(model_size='n', confidence=0.5)
+    tracker = VehicleTracker()
+    classifier = ColorClassifier()
+    try:
+        detector.detect(np.zeros((640, 640, 3), dtype=np.uint8))
+    except Exception:
+        pass
+    return detector, tracker, classifier
 
 
-def processar_video(video_path, line_position=0.5, mostrar_video=True):
+def processar_video(video_path, line_position=0.5, mostrar_video=True,
+                    detect_every=2, modulos=None):
     """
     Processa o video e retorna a contagem automatica.
 
@@ -25,6 +77,11 @@ def processar_video(video_path, line_position=0.5, mostrar_video=True):
         video_path: Caminho do video
         line_position: Posicao da linha de contagem (0-1)
         mostrar_video: Se True, mostra o video durante processamento
+        detect_every: Roda o detector a cada N frames; nos demais o
+            tracker extrapola as caixas pela velocidade recente
+        modulos: Tupla (detector, tracker, classificador) ja criada por
+            preparar_modulos(), para reaproveitar pesos e contexto
+            entre videos; None cria modulos novos
 
     Returns:
         dict com estatisticas de contagem
@@ -36,7 +93,7 @@ def processar_video(video_path, line_position=0.5, mostrar_video=True):
     print(f"Linha de contagem: {int(line_position*100)}%")
     print(f"{'='*60}\n")
 
-    cap = cv2.VideoCapture(video_path)
+    cap = _abrir_video(video_path)
     if not cap.isOpened():
         raise ValueError("Erro ao abrir video")
 
@@ -50,74 +107,346 @@ def processar_video(video_path, line_position=0.5, mostrar_video=True):
     print(f"Total de frames: {total_frames}")
     print(f"Duracao: {total_frames/fps:.1f} segundos\n")
 
-    # Inicializar modulos
-    detector = VehicleDetector(model_size='n', confidence=0.5)
-    tracker = VehicleTracker()
-    color_classifier = ColorClassifier()
+    # Inicializar modulos (ou reaproveitar os ja aquecidos)
+    if modulos is None:
+        detector, tracker, color_classifier = preparar_modulos()
+    else:
+        detector, tracker, color_classifier = modulos
+        tracker.reset()
+        color_classifier.reset()
     counter = VehicleCounter(frame_height=height, line_position=line_position)
 
-    vehicle_colors = {}
+    # Cores por veiculo: array preallocado indexado por track_id com
+    # ids compactos de cor (-1 = desconhecida), como nos dashboards —
+    # sem dict crescendo com todo id ja visto num video longo
+    vehicle_colors = np.full(65536, -1, dtype=np.int8)
     frame_count = 0
     start_time = time.time()
 
-    print("Processando... (Pressione 'q' para cancelar)\n")
+    if mostrar_video:
+        print("Processando... (Pressione 'q' para cancelar)\n")
+    else:
+        print("Processando... (ENTER para cancelar)\n")
+
+    # Pipeline de tres estagios com filas limitadas: enquanto o frame N
+    # esta na inferencia, o N+1 ja foi decodificado pelo leitor e o N-1
+    # esta sendo exibido. Decodificacao e GUI deixam de segurar o
+    # detector; tracker e contador continuam na thread principal, pois
+    # carregam estado por frame.
+    prefetch = 4
+    batch_size = 4   # tamanho do micro-batch de inferencia (abaixo)
+    read_q = queue.Queue(maxsize=prefetch)
+    write_q = queue.Queue(maxsize=prefetch)
+    cancelar = threading.Event()
+
+    def leitor():
+        """Decodifica frames e alimenta a fila de leitura.
+
+        O retrieve escreve num anel de buffers pre-alocados em vez de
+        cap.read() alocar um frame novo por iteracao. Um unico buffer
+        nao serve: o frame segue vivo nas filas, no micro-batch e no
+        exibidor, entao o anel e dimensionado acima do maximo de
+        frames em transito para um buffer so ser reescrito depois de
+        sair do pipeline.
+        """
+        n_buffers = 2 * prefetch + batch_size + 4
+        anel = None
+        if width > 0 and height > 0:
+            anel = [np.empty((height, width, 3), dtype=np.uint8)
+                    for _ in range(n_buffers)]
+        idx = 0
+        while not cancelar.is_set():
+            if anel is not None:
+                if not cap.grab():
+                    break
+                ret, frame = cap.retrieve(anel[idx])
+                idx = (idx + 1) % n_buffers
+            else:
+                ret, frame = cap.read()
+            if not ret:
+                break
+            while not cancelar.is_set():
+                try:
+                    read_q.put(frame, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+        while not cancelar.is_set():
+            try:
+                read_q.put(None, timeout=0.1)  # sentinela de fim
+                break
+            except queue.Full:
+                continue
+
+    def exibidor():
+        """Reduz o frame e anota ja na escala de exibicao; 'q' cancela.
+
+        Redimensionar antes de desenhar faz linha, caixas e texto
+        tocarem ~1/scale^2 menos pixels do que anotar o frame cheio.
+        """
+        scale = 0.6
+        tamanho = (int(width * scale), int(height * scale))
+        # Buffer de exibicao alocado uma unica vez (dst= no resize)
+        frame_show = np.empty((tamanho[1], tamanho[0], 3), dtype=np.uint8)
+        ly = int(counter.line_y * scale)
+        margem = int(counter.zone_margin * scale)
+
+        # Chamaveis do loop como locais: poupa um LOAD_ATTR por chamada
+        _resize = cv2.resize
+        _text = cv2.putText
+        _fonte = cv2.FONT_HERSHEY_SIMPLEX
+
+        # Linha e label sao estaticos na escala de exibicao: rasterizar
+        # uma vez e copiar so os pixels desenhados a cada frame
+        chrome = np.zeros((tamanho[1], tamanho[0], 3), dtype=np.uint8)
+        cv2.line(chrome, (0, ly), (tamanho[0], ly), (0, 255, 255), 2)
+        cv2.putText(chrome, "LINHA DE CONTAGEM", (10, ly - 10),
+                    _fonte, 0.4, (0, 255, 255), 1)
+        chrome_ys, chrome_xs = np.nonzero(chrome.any(axis=2))
+        chrome_px = chrome[chrome_ys, chrome_xs]
+
+        # Caminho OpenCL (T-API): com OpenCL presente, o downscale — a
+        # operacao que toca o frame inteiro — roda na GPU via UMat e so
+        # o frame ja reduzido volta para a anotacao (blits e kernels
+        # numba operam em ndarray)
+        usar_ocl = bool(cv2.ocl.haveOpenCL())
+
+        janela = "SIMV - Validacao (Q para sair)"
+        cv2.namedWindow(janela, cv2.WINDOW_AUTOSIZE)
+        ultimo_show = 0.0
+
+        while True:
+            item = write_q.get()
+            if item is None:
+                break
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+            # Janela minimizada/oculta: consumir a fila e so manter o
+            # teclado vivo, sem pagar resize, desenho e blit
+            if cv2.getWindowProperty(janela, cv2.WND_PROP_VISIBLE) < 1:
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    cancelar.set()
+                    break
+                continue
+
+            # Refresh limitado a ~30 Hz mesmo com o pipeline mais rapido
+            agora = time.monotonic()
+            if agora - ultimo_show < 1 / 30:
+                continue
+            ultimo_show = agora
+
+            frame, tracked = item
+            if usar_ocl:
+                frame_show = _resize(cv2.UMat(frame), tamanho,
+                                     interpolation=cv2.INTER_LINEAR).get()
+            else:
+                _resize(frame, tamanho, dst=frame_show,
+                        interpolation=cv2.INTER_LINEAR)
+
+            # Zona de contagem na escala de exibicao + blit do chrome
+            blend_color_roi(frame_show, 0, max(0, ly - margem),
+                            tamanho[0], min(tamanho[1], ly + margem),
+                            0, 255, 255, 0.1)
+            frame_show[chrome_ys, chrome_xs] = chrome_px
+
+            # Caixas em lote: coercao e escala vetorizadas e bordas pelo
+            # kernel compilado de draw_ops; so os labels ficam no cv2
+            if tracked:
+                tids = [v.get('track_id', -1) for v in tracked]
+                bboxes = (np.asarray([v['bbox'] for v in tracked],
+                                     dtype=np.float32)
+                          * scale).astype(np.int32)
+                color_ids = np.array(
+                    [vehicle_colors[t] if t >= 0 else -1 for t in tids],
+                    dtype=np.int64)
+                border_colors = COLOR_BGR_TABLE[color_ids]
+                draw_bbox_borders(frame_show, bboxes, border_colors, 2)
+
+                for (x1, y1, _, _), track_id, cor in zip(
+                        bboxes.tolist(), tids, border_colors.tolist()):
+                    _text(frame_show, f"ID{track_id}", (x1, y1 - 5),
+                          _fonte, 0.4, tuple(cor), 1)
+
+            cv2.imshow(janela, frame_show)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                cancelar.set()
+                break
 
-        frame_count += 1
-        timestamp = frame_count / fps
-        progress = (frame_count / total_frames) * 100
-
-        # Deteccao e tracking
-        detections = detector.detect(frame)
-        tracked_vehicles = tracker.update(detections, frame)
-
-        # Classificacao de cores
-        for vehicle in tracked_vehicles:
-            track_id = vehicle.get('track_id', -1)
-            if track_id >= 0:
-                color = color_classifier.classify_with_smoothing(
-                    track_id, frame, vehicle['bbox']
+    leitor_t = threading.Thread(target=leitor, daemon=True)
+    leitor_t.start()
+    exibidor_t = None
+    if mostrar_video:
+        exibidor_t = threading.Thread(target=exibidor, daemon=True)
+        exibidor_t.start()
+
+    # Chamaveis quentes do estagio por frame ligados como locais da
+    # funcao externa (LOAD_DEREF no lugar de LOAD_ATTR por chamada)
+    _track = tracker.update
+    _contar = counter.update
+    _get_stats = counter.get_stats
+    _classificar = color_classifier.classify_many
+    _cvt = cv2.cvtColor
+
+    # Progresso impresso por um worker proprio: o caminho quente so
+    # enfileira o percentual; a leitura das estatisticas e o write no
+    # terminal (syscall) saem do loop de inferencia
+    progress_q = queue.Queue()
+
+    def progresso_worker():
+        # Formato pre-ligado e escrita de bytes direto no buffer do
+        # stdout: sem reconstruir a f-string nem pagar o encoder de
+        # texto a cada atualizacao
+        _fmt = ("\rProgresso: {:5.1f}% | Entrada: {} | Saida: {} "
+                "| Total: {}").format
+        _write = sys.stdout.buffer.write
+        _flush = sys.stdout.buffer.flush
+        while True:
+            progress = progress_q.get()
+            if progress is None:
+                break
+            stats = _get_stats()
+            _write(_fmt(progress, stats['total_entrada'],
+                        stats['total_saida'],
+                        stats['total_geral']).encode('ascii'))
+            _flush()
+
+    threading.Thread(target=progresso_worker, daemon=True).start()
+
+    def estagio_frame(frame, count, detections):
+        """Estagios por frame: tracking, cores, contagem e exibicao"""
+        nonlocal vehicle_colors
+        timestamp = count / fps
+        progress = (count / total_frames) * 100
+
+        tracked_vehicles = _track(detections, frame)
+
+        # Classificacao de cores (so em frames com deteccao real; nos
+        # extrapolados o valor suavizado de cada track permanece): uma
+        # conversao HSV do frame cobre todos os veiculos de uma vez
+        if detections is not None:
+            vehicles = [v for v in tracked_vehicles
+                        if v.get('track_id', -1) >= 0]
+            if vehicles:
+                hsv_frame = _cvt(frame, cv2.COLOR_BGR2HSV)
+                track_ids = [v['track_id'] for v in vehicles]
+                cores = _classificar(
+                    hsv_frame, [v['bbox'] for v in vehicles], track_ids
                 )
-                vehicle_colors[track_id] = color
+                for track_id, color in zip(track_ids, cores):
+                    if track_id >= len(vehicle_colors):
+                        # Crescimento geometrico (como o _grow_counted
+                        # do counter): sessoes longas passam de 65536
+                        # ids e um indice fora do array mataria o loop
+                        novo = np.full(max(track_id + 1,
+                                           2 * vehicle_colors.size),
+                                       -1, dtype=np.int8)
+                        novo[:vehicle_colors.size] = vehicle_colors
+                        vehicle_colors = novo
+                    vehicle_colors[track_id] = COLOR_IDS[color]
 
         # Contagem
-        newly_counted = counter.update(tracked_vehicles, vehicle_colors, timestamp)
+        newly_counted = _contar(tracked_vehicles, vehicle_colors, timestamp)
 
-        # Mostrar progresso
-        if frame_count % 30 == 0:
-            stats = counter.get_stats()
-            print(f"\rProgresso: {progress:5.1f}% | Entrada: {stats['total_entrada']} | Saida: {stats['total_saida']} | Total: {stats['total_geral']}", end="")
+        # Mostrar progresso (impressao delegada ao worker)
+        if count % 30 == 0:
+            progress_q.put_nowait(progress)
 
-        # Mostrar video (opcional)
+        # Entregar ao exibidor, que reduz e anota na escala de exibicao
         if mostrar_video:
-            frame = counter.draw_counting_line(frame)
-
-            for vehicle in tracked_vehicles:
-                bbox = vehicle['bbox']
-                track_id = vehicle.get('track_id', -1)
-                x1, y1, x2, y2 = [int(c) for c in bbox]
-
-                color = vehicle_colors.get(track_id, 'indefinido')
-                box_color = color_classifier.get_color_bgr(color)
-
-                cv2.rectangle(frame, (x1, y1), (x2, y2), box_color, 2)
-                label = f"ID{track_id}"
-                cv2.putText(frame, label, (x1, y1 - 5),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, box_color, 2)
+            while not cancelar.is_set():
+                try:
+                    write_q.put((frame, tracked_vehicles), timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+    # Micro-batch de inferencia: os frames marcados pelo detect_every
+    # acumulam ate batch_size e pagam uma unica chamada ao detector;
+    # tracker e contador continuam recebendo os frames em ordem
+    batch_frames = []
+    batch_counts = []
+    batch_detect = []
+
+    # Porteiro de mudanca de cena: miniatura 160x90 em tons de cinza
+    # comparada com a da ultima deteccao; se a estrada esta parada
+    # (diferenca media < 2), a inferencia do frame e dispensada e o
+    # tracker segue extrapolando. Buffers alocados uma unica vez.
+    thumb_bgr = np.empty((90, 160, 3), dtype=np.uint8)
+    thumb = np.empty((90, 160), dtype=np.uint8)
+    prev_thumb = None
+
+    def cena_mudou(frame):
+        """Compara a miniatura do frame com a da ultima deteccao"""
+        nonlocal prev_thumb
+        cv2.resize(frame, (160, 90), dst=thumb_bgr,
+                   interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(thumb_bgr, cv2.COLOR_BGR2GRAY, dst=thumb)
+        if prev_thumb is None:
+            prev_thumb = thumb.copy()
+            return True
+        if cv2.absdiff(thumb, prev_thumb).mean() < 2.0:
+            return False
+        np.copyto(prev_thumb, thumb)
+        return True
+
+    def flush_batch():
+        """Infere o lote pendente e roda os estagios por frame"""
+        alvos = [f for f, d in zip(batch_frames, batch_detect) if d]
+        det_iter = iter(detector.detect_batch(alvos) if alvos else [])
+        for bframe, bcount, detectar in zip(batch_frames, batch_counts,
+                                            batch_detect):
+            estagio_frame(bframe, bcount,
+                          next(det_iter) if detectar else None)
+        batch_frames.clear()
+        batch_counts.clear()
+        batch_detect.clear()
+
+    # ENTER-cancela so vale em terminal interativo: com stdin em pipe
+    # (ex.: menu alimentado por printf) o select acusa legivel no EOF e
+    # o processamento se autocancelaria no frame 30
+    stdin_tty = sys.stdin.isatty()
+
+    while not cancelar.is_set():
+        try:
+            frame = read_q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if frame is None:
+            break
 
-            # Redimensionar para exibicao
-            scale = 0.6
-            frame_show = cv2.resize(frame, (int(width*scale), int(height*scale)))
-            cv2.imshow("SIMV - Validacao (Q para sair)", frame_show)
+        frame_count += 1
 
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                print("\n\nProcessamento cancelado pelo usuario!")
-                break
+        # Sem janela nao ha waitKey: checar o stdin (sem bloquear) a
+        # cada 30 frames da um caminho de cancelamento em modo headless
+        if (not mostrar_video and stdin_tty and frame_count % 30 == 0
+                and select.select([sys.stdin], [], [], 0)[0]):
+            sys.stdin.readline()
+            cancelar.set()
+            break
 
+        detectar = ((frame_count - 1) % max(1, detect_every) == 0
+                    and cena_mudou(frame))
+        batch_frames.append(frame)
+        batch_counts.append(frame_count)
+        batch_detect.append(detectar)
+
+        if len(batch_frames) == batch_size:
+            flush_batch()
+
+    if not cancelar.is_set():
+        flush_batch()  # resto do lote no fim do video
+
+    if cancelar.is_set():
+        print("\n\nProcessamento cancelado pelo usuario!")
+    elif exibidor_t is not None:
+        write_q.put(None)
+        exibidor_t.join()
+
+    cancelar.set()
+    progress_q.put_nowait(None)
+    # O VideoCapture nao e thread-safe: esperar o leitor sair do
+    # grab/retrieve antes do release (os loops dele checam `cancelar`
+    # a cada 0.1s, entao o join e rapido)
+    leitor_t.join()
     cap.release()
     cv2.destroyAllWindows()
 
@@ -145,62 +474,36 @@ def calcular_metricas(contagem_sistema, contagem_manual_entrada, contagem_manual
     Returns:
         dict com metricas calculadas
     """
-    sistema_entrada = contagem_sistema['total_entrada']
-    sistema_saida = contagem_sistema['total_saida']
-    sistema_total = contagem_sistema['total_geral']
-
-    manual_total = contagem_manual_entrada + contagem_manual_saida
-
-    # Acuracia por direcao
-    if contagem_manual_entrada > 0:
-        acuracia_entrada = min(sistema_entrada / contagem_manual_entrada, 1.0) * 100
-        erro_entrada = abs(sistema_entrada - contagem_manual_entrada)
-    else:
-        acuracia_entrada = 100 if sistema_entrada == 0 else 0
-        erro_entrada = sistema_entrada
-
-    if contagem_manual_saida > 0:
-        acuracia_saida = min(sistema_saida / contagem_manual_saida, 1.0) * 100
-        erro_saida = abs(sistema_saida - contagem_manual_saida)
-    else:
-        acuracia_saida = 100 if sistema_saida == 0 else 0
-        erro_saida = sistema_saida
-
-    # Acuracia total
-    if manual_total > 0:
-        # Calculo considerando erros (tanto para mais quanto para menos)
-        erro_total = abs(sistema_total - manual_total)
-        acuracia_total = max(0, (1 - erro_total / manual_total)) * 100
-    else:
-        acuracia_total = 100 if sistema_total == 0 else 0
-
-    # Metricas detalhadas
+    # Vetores [entrada, saida, total]: diferencas, erros e acuracias
+    # saem em aritmetica NumPy de uma vez, sem a cascata de if/round
+    # escalar por direcao
+    sistema = np.array([contagem_sistema['total_entrada'],
+                        contagem_sistema['total_saida'],
+                        contagem_sistema['total_geral']], dtype=np.int64)
+    manual = np.array([contagem_manual_entrada,
+                       contagem_manual_saida,
+                       contagem_manual_entrada + contagem_manual_saida],
+                      dtype=np.int64)
+
+    diff = sistema - manual
+    erro = np.abs(diff)
+    base = np.maximum(manual, 1)
+
+    # Por direcao, contagem acima da manual satura em 100%; no total o
+    # erro penaliza tanto para mais quanto para menos
+    acuracia = np.minimum(sistema / base, 1.0) * 100
+    acuracia[2] = max(0.0, 1 - erro[2] / base[2]) * 100
+    acuracia = np.where(manual > 0, acuracia,
+                        np.where(sistema == 0, 100.0, 0.0))
+    acuracia = np.round(acuracia, 1)
+
+    chaves = ('entrada', 'saida', 'total')
     metricas = {
-        'contagem_manual': {
-            'entrada': contagem_manual_entrada,
-            'saida': contagem_manual_saida,
-            'total': manual_total
-        },
-        'contagem_sistema': {
-            'entrada': sistema_entrada,
-            'saida': sistema_saida,
-            'total': sistema_total
-        },
-        'diferenca': {
-            'entrada': sistema_entrada - contagem_manual_entrada,
-            'saida': sistema_saida - contagem_manual_saida,
-            'total': sistema_total - manual_total
-        },
-        'acuracia': {
-            'entrada': round(acuracia_entrada, 1),
-            'saida': round(acuracia_saida, 1),
-            'total': round(acuracia_total, 1)
-        },
-        'erro_absoluto': {
-            'entrada': erro_entrada,
-            'saida': erro_saida,
-            'total': abs(sistema_total - manual_total)
-        }
+        'contagem_manual': dict(zip(chaves, manual.tolist())),
+        'contagem_sistema': dict(zip(chaves, sistema.tolist())),
+        'diferenca': dict(zip(chaves, diff.tolist())),
+        'acuracia': dict(zip(chaves, acuracia.tolist())),
+        'erro_absoluto': dict(zip(chaves, erro.tolist()))
     }
 
     return metricas
@@ -271,8 +574,14 @@ def salvar_relatorio(metricas, video_path, output_path=None):
         'metricas': metricas
     }
 
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    if ORJSON_DISPONIVEL:
+        # Serializador em C: escreve os bytes ja codificados de uma vez,
+        # sem o encoder caractere a caractere do json com indentacao
+        Path(output_path).write_bytes(
+            orjson.dumps(relatorio, option=orjson.OPT_INDENT_2))
+    else:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
 
     print(f"Relatorio salvo em: {output_path}")
     return output_path
@@ -296,54 +605,101 @@ def modo_contagem_manual(video_path):
     print("  Q       - Finalizar e salvar")
     print(f"{'='*60}\n")
 
-    cap = cv2.VideoCapture(video_path)
+    cap = _abrir_video(video_path)
     if not cap.isOpened():
         raise ValueError("Erro ao abrir video")
 
     fps = int(cap.get(cv2.CAP_PROP_FPS)) or 30
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    largura = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    altura = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    # Aqui o frame e consumido na hora (copiado para display), entao um
+    # unico buffer de retrieve atende todas as leituras sem cap.read()
+    # alocar um frame novo por iteracao
+    frame_buf = (np.empty((altura, largura, 3), dtype=np.uint8)
+                 if largura > 0 and altura > 0 else None)
+
+    def _ler():
+        if frame_buf is None:
+            return cap.read()
+        if not cap.grab():
+            return False, None
+        return cap.retrieve(frame_buf)
 
     contagem_entrada = 0
     contagem_saida = 0
     pausado = False
     frame_atual = 0
 
+    # Buffers reutilizados do overlay e da exibicao: copiar/redimensionar
+    # para dst fixo evita duas alocacoes de frame inteiro por iteracao
+    display = None
+    display_show = None
+
+    # Painel de contagem rasterizado uma vez: fundo, borda e rotulos
+    # sao estaticos; so os numeros mudam, e sao redesenhados apenas
+    # quando (frame, entrada, saida) muda — em vez de 2 rectangle +
+    # 4 putText sobre o frame inteiro a cada iteracao. O recorte
+    # 8..143 x 8..353 cobre a borda de espessura 2 do retangulo
+    # (10,10)-(350,140).
+    fonte = cv2.FONT_HERSHEY_SIMPLEX
+    panel_estatico = np.zeros((135, 345, 3), dtype=np.uint8)
+    cv2.rectangle(panel_estatico, (2, 2), (342, 132), (255, 255, 255), 2)
+    cv2.putText(panel_estatico, "CONTAGEM MANUAL", (12, 27),
+                fonte, 0.7, (255, 255, 255), 2)
+    cv2.putText(panel_estatico, "Frame:", (12, 52),
+                fonte, 0.5, (200, 200, 200), 1)
+    cv2.putText(panel_estatico, "ENTRADA (E):", (12, 82),
+                fonte, 0.7, (0, 255, 0), 2)
+    cv2.putText(panel_estatico, "SAIDA (S):", (12, 112),
+                fonte, 0.7, (0, 0, 255), 2)
+    panel = np.empty_like(panel_estatico)
+    panel_chave = None
+
     while True:
         if not pausado:
-            ret, frame = cap.read()
+            ret, frame = _ler()
             if not ret:
                 break
             frame_atual = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
 
         # Overlay com informacoes
-        display = frame.copy()
+        if display is None or display.shape != frame.shape:
+            display = np.empty_like(frame)
+        np.copyto(display, frame)
         h, w = display.shape[:2]
 
-        # Fundo para texto
-        cv2.rectangle(display, (10, 10), (350, 140), (0, 0, 0), -1)
-        cv2.rectangle(display, (10, 10), (350, 140), (255, 255, 255), 2)
-
-        # Textos
-        cv2.putText(display, "CONTAGEM MANUAL", (20, 35),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        cv2.putText(display, f"Frame: {frame_atual}/{total_frames}", (20, 60),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (200, 200, 200), 1)
-        cv2.putText(display, f"ENTRADA (E): {contagem_entrada}", (20, 90),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        cv2.putText(display, f"SAIDA (S):   {contagem_saida}", (20, 120),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        # Painel: redesenhar os numeros so quando o estado muda e
+        # colar o raster pronto sobre o frame
+        chave = (frame_atual, contagem_entrada, contagem_saida)
+        if chave != panel_chave:
+            np.copyto(panel, panel_estatico)
+            cv2.putText(panel, f"{frame_atual}/{total_frames}", (72, 52),
+                        fonte, 0.5, (200, 200, 200), 1)
+            cv2.putText(panel, str(contagem_entrada), (182, 82),
+                        fonte, 0.7, (0, 255, 0), 2)
+            cv2.putText(panel, str(contagem_saida), (182, 112),
+                        fonte, 0.7, (0, 0, 255), 2)
+            panel_chave = chave
+        display[8:143, 8:353] = panel
 
         if pausado:
             cv2.putText(display, "PAUSADO", (w-150, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+                        fonte, 0.7, (0, 255, 255), 2)
 
         # Linha de referencia no centro
         cv2.line(display, (0, h//2), (w, h//2), (0, 255, 255), 2)
 
         # Redimensionar
         scale = 0.7
-        display = cv2.resize(display, (int(w*scale), int(h*scale)))
-        cv2.imshow("Contagem Manual - SIMV", display)
+        tamanho = (int(w*scale), int(h*scale))
+        if display_show is None or display_show.shape[:2] != tamanho[::-1]:
+            display_show = np.empty((tamanho[1], tamanho[0], 3),
+                                    dtype=np.uint8)
+        cv2.resize(display, tamanho, dst=display_show,
+                   interpolation=cv2.INTER_LINEAR)
+        cv2.imshow("Contagem Manual - SIMV", display_show)
 
         key = cv2.waitKey(30 if not pausado else 0) & 0xFF
 
@@ -362,13 +718,13 @@ def modo_contagem_manual(video_path):
             contagem_saida = 0
             print("Contagem resetada!")
         elif key == ord('d') and pausado:
-            ret, frame = cap.read()
+            ret, frame = _ler()
             if not ret:
                 cap.set(cv2.CAP_PROP_POS_FRAMES, total_frames - 1)
         elif key == ord('a') and pausado:
             pos = max(0, int(cap.get(cv2.CAP_PROP_POS_FRAMES)) - 2)
             cap.set(cv2.CAP_PROP_POS_FRAMES, pos)
-            ret, frame = cap.read()
+            ret, frame = _ler()
 
     cap.release()
     cv2.destroyAllWindows()
@@ -400,6 +756,10 @@ def main():
         print(f"Erro: Video '{video_path}' nao encontrado!")
         return
 
+    # Modulos pesados criados e aquecidos uma unica vez: reprocessar o
+    # video (outra linha, outra opcao) nao paga a carga do modelo de novo
+    modulos = preparar_modulos()
+
     # Menu
     print("\nOpcoes:")
     print("1. Fazer contagem manual primeiro (recomendado)")
@@ -419,7 +779,8 @@ def main():
         line_pos = input("Posicao da linha (0.2-0.8, padrao 0.5): ").strip()
         line_pos = float(line_pos) if line_pos else 0.5
 
-        stats = processar_video(video_path, line_position=line_pos, mostrar_video=True)
+        stats = processar_video(video_path, line_position=line_pos,
+                                mostrar_video=True, modulos=modulos)
 
         # Calcular e exibir metricas
         metricas = calcular_metricas(stats, entrada_manual, saida_manual)
@@ -440,7 +801,8 @@ def main():
 
         mostrar = input("Mostrar video durante processamento? (s/n): ").strip().lower() == 's'
 
-        stats = processar_video(video_path, line_position=line_pos, mostrar_video=mostrar)
+        stats = processar_video(video_path, line_position=line_pos,
+                                mostrar_video=mostrar, modulos=modulos)
 
         # Calcular e exibir metricas
         metricas = calcular_metricas(stats, entrada_manual, saida_manual)
@@ -455,7 +817,8 @@ def main():
         line_pos = input("Posicao da linha (0.2-0.8, padrao 0.5): ").strip()
         line_pos = float(line_pos) if line_pos else 0.5
 
-        stats = processar_video(video_path, line_position=line_pos, mostrar_video=True)
+        stats = processar_video(video_path, line_position=line_pos,
+                                mostrar_video=True, modulos=modulos)
 
         print("\nRESULTADO:")
         print(f"Entrada: {stats['total_entrada']}")